@@ -0,0 +1,300 @@
+"""
+Async views for read-only endpoints.
+Used instead of sync viewsets when project is served by ASGI workers.
+Unsafe methods are passed to sync viewsets.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import Throttled
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from food.models import Ingredient, Recipe, Tag
+from users.models import User
+from .caching import acached_page
+from .filters import RecipeFilter
+from .paginators import PAGE_LIMIT, PageLimitPagination
+from .renderers import FastJSONRenderer
+from .representations import recipes_representation
+from .serializers import UserSubscriptionsSerializer
+from .sparse import prune_users, sparse_fields
+from .throttles import CounterScopedThrottle
+
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit')
+
+
+def json_response(data, status=200):
+    """Same output as FastJSONRenderer."""
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status,
+        content_type='application/json'
+    )
+
+
+def not_found():
+    return json_response({'detail': 'Not found.'}, 404)
+
+
+def safe_methods_only(fallback):
+    """
+    GET goes to decorated async view, everything else to fallback view.
+    Fallback view is a sync one, so it is called in a thread.
+    """
+    fallback = sync_to_async(fallback)
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method == 'GET':
+                return await view(request, *args, **kwargs)
+
+            return await fallback(request, *args, **kwargs)
+
+        wrapper.csrf_exempt = True
+
+        return wrapper
+
+    return decorator
+
+
+async def authenticate(request):
+    """
+    Async version of TokenAuthentication.
+    Returns DRF request with user set, or None if token is invalid.
+    """
+    user = AnonymousUser()
+    auth = request.headers.get('Authorization', '').split()
+    if auth and auth[0].lower() == 'token':
+        if len(auth) != 2:
+            return None
+        try:
+            token = await Token.objects.select_related('user').aget(
+                key=auth[1]
+            )
+        except Token.DoesNotExist:
+            return None
+        if not token.user.is_active:
+            return None
+        user = token.user
+
+    drf_request = Request(request)
+    drf_request.user = user
+
+    return drf_request
+
+
+def auth_required(view):
+    """Authenticate request and pass it to view as DRF request."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        drf_request = await authenticate(request)
+        if drf_request is None:
+            return json_response({'detail': 'Invalid token.'}, 401)
+
+        return await view(drf_request, *args, **kwargs)
+
+    return wrapper
+
+
+def throttled(scope):
+    """
+    Same throttling as throttle_scope of sync views.
+    Decorated view gets DRF request, so goes after auth_required.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            throttle = CounterScopedThrottle()
+            if not await sync_to_async(throttle.allow_request)(
+                request, wrapper
+            ):
+                exc = Throttled(throttle.wait())
+                response = json_response({'detail': str(exc.detail)}, 429)
+                response['Retry-After'] = '%d' % exc.wait
+
+                return response
+
+            return await view(request, *args, **kwargs)
+
+        wrapper.throttle_scope = scope
+
+        return wrapper
+
+    return decorator
+
+
+async def paginate(request, queryset):
+    """
+    Async version of PageLimitPagination.
+    Returns page objects and response body without results.
+    """
+    pagination = PageLimitPagination
+    try:
+        limit = int(request.query_params[pagination.page_size_query_param])
+        if limit <= 0:
+            raise ValueError
+    except (KeyError, ValueError):
+        limit = PAGE_LIMIT
+    count = await queryset.acount()
+    pages = max((count - 1) // limit + 1, 1)
+    page = request.query_params.get(pagination.page_query_param, 1)
+    if page in pagination.last_page_strings:
+        page = pages
+    try:
+        page = int(page)
+        if not 1 <= page <= pages:
+            raise ValueError
+    except ValueError:
+        return None, None
+
+    url = request.build_absolute_uri()
+    next_link = previous_link = None
+    if page < pages:
+        next_link = replace_query_param(
+            url, pagination.page_query_param, page + 1
+        )
+    if page == 2:
+        previous_link = remove_query_param(url, pagination.page_query_param)
+    elif page > 2:
+        previous_link = replace_query_param(
+            url, pagination.page_query_param, page - 1
+        )
+    objects = [obj async for obj in queryset[(page - 1) * limit:page * limit]]
+
+    return objects, {
+        'count': count,
+        'next': next_link,
+        'previous': previous_link
+    }
+
+
+async def serialize(serializer_class, instance, request, many=False):
+    """Serializers still touch database, so they run in a thread."""
+    serializer = serializer_class(
+        instance,
+        many=many,
+        context={'request': request}
+    )
+
+    return await sync_to_async(lambda: serializer.data)()
+
+
+async def tags_list(request):
+    return json_response([
+        tag async for tag in Tag.objects.values(*TAG_FIELDS)
+    ])
+
+
+async def tag_detail(request, pk):
+    tag = await Tag.objects.values(*TAG_FIELDS).filter(pk=pk).afirst()
+    if tag is None:
+        return not_found()
+
+    return json_response(tag)
+
+
+@auth_required
+@throttled('ingredients')
+async def ingredients_list(request):
+    queryset = Ingredient.objects.values(*INGREDIENT_FIELDS)
+    name = request.GET.get('name')
+    if name:
+        queryset = queryset.filter(name__icontains=name)
+
+    return json_response([ingredient async for ingredient in queryset])
+
+
+@auth_required
+@throttled('ingredients')
+async def ingredient_detail(request, pk):
+    ingredient = await Ingredient.objects.values(
+        *INGREDIENT_FIELDS
+    ).filter(pk=pk).afirst()
+    if ingredient is None:
+        return not_found()
+
+    return json_response(ingredient)
+
+
+def recipes_queryset(request):
+    """Same queryset as RecipeViewSet.get_queryset returns."""
+    tags = request.query_params.getlist('tags')
+    queryset = Recipe.objects.order_by('-date_created')
+    if tags:
+        queryset = queryset.filter(tags__slug__in=tags).distinct()
+
+    return queryset
+
+
+@auth_required
+async def recipes_list(request):
+    filterset = RecipeFilter(
+        request.query_params,
+        recipes_queryset(request),
+        request=request
+    )
+    if not filterset.is_valid():
+        return json_response(filterset.errors, 400)
+
+    async def build():
+        pks, body = await paginate(
+            request,
+            filterset.qs.values_list('pk', flat=True)
+        )
+        if pks is None:
+            return None
+
+        body['results'] = await sync_to_async(recipes_representation)(
+            pks, request
+        )
+
+        return body
+
+    if request.user.is_authenticated:
+        body = await build()
+    else:
+        body = await acached_page(request, build)
+    if body is None:
+        return json_response({'detail': 'Invalid page.'}, 404)
+
+    return json_response(body)
+
+
+@auth_required
+async def recipe_detail(request, pk):
+    recipes = await sync_to_async(recipes_representation)([pk], request)
+    if not recipes:
+        return not_found()
+
+    return json_response(recipes[0])
+
+
+@auth_required
+async def subscriptions(request):
+    if not request.user.is_authenticated:
+        return json_response(
+            {'detail': 'Authentication credentials were not provided.'},
+            401
+        )
+
+    authors, body = await paginate(
+        request,
+        prune_users(
+            User.objects.followed_by(request.user),
+            sparse_fields(request, UserSubscriptionsSerializer.Meta.fields)
+        ).order_by('pk')
+    )
+    if authors is None:
+        return json_response({'detail': 'Invalid page.'}, 404)
+
+    body['results'] = await serialize(
+        UserSubscriptionsSerializer, authors, request, many=True
+    )
+
+    return json_response(body)
@@ -0,0 +1,101 @@
+"""
+Shared cache of recipe list pages for anonymous users.
+All per-user flags are False for them, so a page depends only
+on query parameters. Pages of old generation are never read again
+after recipes change.
+"""
+import asyncio
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import urlencode
+
+GENERATION_KEY = 'recipes-pages-generation'
+
+
+def invalidate_pages():
+    """Start new generation of cached pages."""
+    if not cache.add(GENERATION_KEY, time.time_ns(), None):
+        cache.incr(GENERATION_KEY)
+
+
+def page_key(request, generation):
+    """Same key for any order of query parameters and their values."""
+    params = urlencode(sorted(
+        (key, sorted(filter(None, request.GET.getlist(key))))
+        for key in request.GET
+    ), doseq=True)
+    signature = f'{request.build_absolute_uri(request.path)}?{params}'
+
+    return f'recipes-page:{generation}:{md5(signature.encode()).hexdigest()}'
+
+
+def cached_page(request, build):
+    """
+    Returns cached page or builds it with build().
+    Only one process builds missing page, others wait for it
+    (single-flight) and build it themselves only if waiting took too long.
+    """
+    key = page_key(
+        request,
+        cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+    )
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    lock = f'{key}:lock'
+    timeout = settings.RECIPES_PAGE_LOCK_SECONDS
+    if cache.add(lock, True, timeout):
+        try:
+            data = build()
+            cache.set(key, data, settings.RECIPES_PAGE_CACHE_SECONDS)
+        finally:
+            cache.delete(lock)
+
+        return data
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(settings.RECIPES_PAGE_POLL_SECONDS)
+        data = cache.get(key)
+        if data is not None:
+            return data
+
+    return build()
+
+
+async def acached_page(request, build):
+    """Same as cached_page for async views, build is coroutine function."""
+    key = page_key(
+        request,
+        await cache.aget_or_set(GENERATION_KEY, time.time_ns, None)
+    )
+    data = await cache.aget(key)
+    if data is not None:
+        return data
+
+    lock = f'{key}:lock'
+    timeout = settings.RECIPES_PAGE_LOCK_SECONDS
+    if await cache.aadd(lock, True, timeout):
+        try:
+            data = await build()
+            if data is not None:
+                await cache.aset(
+                    key, data, settings.RECIPES_PAGE_CACHE_SECONDS
+                )
+        finally:
+            await cache.adelete(lock)
+
+        return data
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.RECIPES_PAGE_POLL_SECONDS)
+        data = await cache.aget(key)
+        if data is not None:
+            return data
+
+    return await build()
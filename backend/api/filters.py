@@ -1,6 +1,8 @@
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from django_filters import rest_framework as filters
 
+from users.models import Cart, Favorites
+
 
 class RecipeFilter(filters.FilterSet):
     """Custom Filterset for Recipe Viewset."""
@@ -8,30 +10,42 @@ class RecipeFilter(filters.FilterSet):
     is_favorited = filters.BooleanFilter(method='get_is_favorited')
     author = filters.NumberFilter('author')
 
-    def common_method_filter(self, queryset, dict_values, value):
-        """Just DRY."""
-        if value:
-            return queryset.filter(**dict_values)
+    def common_method_filter(self, queryset, model, value):
+        """
+        Correlated EXISTS or NOT EXISTS over unique (user, recipe) index,
+        rows are not multiplied by joins. Anonymous users have nothing.
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none() if value else queryset
+
+        linked = Exists(model.objects.filter(user=user, recipe=OuterRef('pk')))
 
-        return queryset.filter(~Q(**dict_values))
+        return queryset.filter(linked if value else ~linked)
 
     def get_is_in_cart(self, queryset, name, value):
         """Returns filtered queryset for recipes in cart."""
-        return self.common_method_filter(
-            queryset,
-            {'carts__user': self.request.user},
-            value
-        )
+        return self.common_method_filter(queryset, Cart, value)
 
     def get_is_favorited(self, queryset, name, value):
         """Returns filtered queryset for favorited recipes."""
-        return self.common_method_filter(
-            queryset,
-            {'favorited__user': self.request.user},
-            value
-        )
+        return self.common_method_filter(queryset, Favorites, value)
 
 
 class IngredientFilter(filters.FilterSet):
     """Filterset that allows filtering by ingredient name."""
     name = filters.CharFilter('name', 'icontains')
+
+
+class UserFilter(filters.FilterSet):
+    """
+    Filterset that allows searching users by start of username or email.
+    Prefix lookups are served by unique indexes of those columns.
+    """
+    search = filters.CharFilter(method='get_search')
+
+    def get_search(self, queryset, name, value):
+        """Returns users with username or email starting with value."""
+        return queryset.filter(
+            Q(username__startswith=value) | Q(email__startswith=value)
+        )
@@ -0,0 +1,59 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import FastJSONRenderer
+from api.representations import recipes_representation
+from api.serializers import RecipeSerializer
+from food.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Command class. See help attribute for further info."""
+    help = '''Compare rows/sec of RecipeSerializer with JSONRenderer
+        and fast representation with FastJSONRenderer on existing recipes.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--user', type=int, help='Id of request user')
+
+    def _measure(self, build, renderer, rows, repeat):
+        """Returns rows per second."""
+        start = time.perf_counter()
+        for _ in range(repeat):
+            renderer.render(build())
+
+        return rows * repeat / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = (
+            User.objects.get(pk=options['user'])
+            if options['user'] else AnonymousUser()
+        )
+        queryset = Recipe.objects.order_by('-date_created')[:options['limit']]
+        pks = list(queryset.values_list('pk', flat=True))
+        serializer_speed = self._measure(
+            lambda: RecipeSerializer(
+                queryset, many=True, context={'request': request}
+            ).data,
+            JSONRenderer(),
+            len(pks),
+            options['repeat']
+        )
+        fast_speed = self._measure(
+            lambda: recipes_representation(pks, request),
+            FastJSONRenderer(),
+            len(pks),
+            options['repeat']
+        )
+        self.stdout.write(
+            f'RecipeSerializer: {serializer_speed:.0f} rows/s\n'
+            f'Fast representation: {fast_speed:.0f} rows/s'
+        )
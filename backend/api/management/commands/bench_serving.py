@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/tags/',
+    '/api/ingredients/?name=a',
+)
+
+
+class Command(BaseCommand):
+    """Command class. See help attribute for further info."""
+    help = '''Fire concurrent GET requests at running server and report
+        throughput and latency. Run it against WSGI and ASGI deployments
+        with the same worker count to compare them.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='http://localhost:8000')
+        parser.add_argument('--path', action='append', dest='paths')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--token', help='Token for authenticated reads')
+
+    def _fetch(self, url, headers):
+        """Returns latency of one request or None on error."""
+        start = time.perf_counter()
+        try:
+            with urlopen(Request(url, headers=headers), timeout=30) as resp:
+                resp.read()
+        except OSError:
+            return None
+
+        return time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        for path in options['paths'] or DEFAULT_PATHS:
+            url = options['host'] + path
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                results = list(executor.map(
+                    lambda _: self._fetch(url, headers),
+                    range(options['requests'])
+                ))
+            elapsed = time.perf_counter() - start
+            latencies = sorted(r for r in results if r is not None)
+            if not latencies:
+                self.stderr.write(f'{path}: all requests failed')
+                continue
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f'{path}: {len(latencies) / elapsed:.1f} req/s, '
+                f'p50 {median(latencies) * 1000:.1f} ms, '
+                f'p95 {p95 * 1000:.1f} ms, '
+                f'errors {len(results) - len(latencies)}'
+            )
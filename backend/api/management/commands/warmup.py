@@ -0,0 +1,65 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.warmup import warm_up
+
+# Runs in fresh interpreter: boot time, then latency of the same request
+# twice, with or without warm-up in between.
+MEASURE_SCRIPT = '''
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+from backend.wsgi import application
+from django.conf import settings
+from django.test import Client
+result = {'boot': time.perf_counter() - start}
+if sys.argv[2] == 'warm':
+    from api.warmup import warm_up
+    result['warm_up'] = warm_up()
+client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+for attempt in ('first', 'second'):
+    start = time.perf_counter()
+    client.get(sys.argv[1])
+    result[attempt] = time.perf_counter() - start
+print(json.dumps(result))
+'''
+
+
+class Command(BaseCommand):
+    """Command class. See help attribute for further info."""
+    help = '''Warm up this process (imports, URL resolver, serializer
+        fields, database connections). With --measure report boot time
+        and first request latency of fresh processes with and without
+        warm-up.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--measure', action='store_true')
+        parser.add_argument('--url', default='/api/recipes/')
+
+    def _measure(self, url, mode):
+        output = subprocess.run(
+            [sys.executable, '-c', MEASURE_SCRIPT, url, mode],
+            env={**os.environ, 'PYTHONPATH': str(settings.BASE_DIR)},
+            capture_output=True,
+            check=True,
+            text=True
+        ).stdout
+
+        return json.loads(output.splitlines()[-1])
+
+    def handle(self, *args, **options):
+        if not options['measure']:
+            self.stdout.write(f'Warmed up in {warm_up() * 1000:.0f} ms')
+            return
+
+        for mode in ('cold', 'warm'):
+            result = self._measure(options['url'], mode)
+            self.stdout.write(f'{mode}: ' + ', '.join(
+                f'{name} {seconds * 1000:.0f} ms'
+                for name, seconds in result.items()
+            ))
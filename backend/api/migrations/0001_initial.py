@@ -0,0 +1,25 @@
+# Generated by Django 4.1.7 on 2026-10-19 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicVersion',
+            fields=[
+                ('topic', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Model label')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Topic version',
+                'verbose_name_plural': 'Topic versions',
+            },
+        ),
+    ]
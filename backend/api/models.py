@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class TopicVersion(models.Model):
+    """Version of topic of backend.invalidation kept in database."""
+    topic = models.CharField('Model label', max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Topic version'
+        verbose_name_plural = 'Topic versions'
+
+    def __str__(self) -> str:
+        return f'{self.topic} v{self.version}'
@@ -1,4 +1,4 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 PAGE_LIMIT = 6
 
@@ -7,3 +7,10 @@ class PageLimitPagination(PageNumberPagination):
     """Paginator with custom page_size parameter."""
     page_size = PAGE_LIMIT
     page_size_query_param = 'limit'
+
+
+class FeedPagination(CursorPagination):
+    """Cursor paginator, page read costs the same at any depth."""
+    page_size = PAGE_LIMIT
+    page_size_query_param = 'limit'
+    ordering = '-date_created'
@@ -0,0 +1,147 @@
+"""
+Profiling of single requests on demand.
+Staff user adds ?_profile=1 or X-Profile: 1 header to a slow request and
+gets back its profile and SQL queries instead of the response.
+Other requests pay one dictionary lookup.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_ON = '1'
+
+# Functions of the longest cumulative time shown in report.
+PROFILE_LINES = 60
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def profile_requested(request):
+    """Only 1 turns profiling on, other values such as 0 leave it off."""
+    return (
+        request.GET.get(PROFILE_PARAM) == PROFILE_ON
+        or request.META.get(PROFILE_HEADER) == PROFILE_ON
+    )
+
+
+def is_staff(request):
+    """Session is checked as by admin, token as by API views."""
+    if request.user.is_staff:
+        return True
+
+    try:
+        return Request(request, authenticators=[
+            authenticator()
+            for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ]).user.is_staff
+    except APIException:
+        return False
+
+
+def profile_report(profiler):
+    """Returns hottest functions and call tree of api code as text."""
+    hottest, calls = io.StringIO(), io.StringIO()
+    pstats.Stats(profiler, stream=hottest).sort_stats(
+        'cumulative'
+    ).print_stats(PROFILE_LINES)
+    pstats.Stats(profiler, stream=calls).sort_stats(
+        'cumulative'
+    ).print_callees(re.escape(API_DIR))
+
+    return hottest.getvalue(), calls.getvalue()
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """
+    Runs requests of staff asking for it under cProfile and records
+    queries to all databases. Profile is stored in PROFILE_DIR if set,
+    to be opened with pstats or snakeviz.
+    """
+    def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+
+        if not profile_requested(request) or not is_staff(request):
+            return self.get_response(request)
+
+        return self._profile(request, self.get_response)
+
+    async def __acall__(self, request):
+        """
+        Async views run in their own event loop thread, so only ORM
+        calls of them get into profile.
+        """
+        if not profile_requested(request) or not await sync_to_async(
+            is_staff
+        )(request):
+            return await self.get_response(request)
+
+        return await sync_to_async(self._profile)(
+            request, async_to_sync(self.get_response)
+        )
+
+    def _profile(self, request, get_response):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append({
+                    'database': context['connection'].alias,
+                    'sql': sql,
+                    'duration': time.perf_counter() - start,
+                })
+
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record))
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - start
+
+        hottest, calls = profile_report(profiler)
+        report = {
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration': duration,
+            'queries_count': len(queries),
+            'queries_duration': sum(query['duration'] for query in queries),
+            'queries': queries,
+            'profile': hottest,
+            'api_calls': calls,
+        }
+        if settings.PROFILE_DIR:
+            os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+            report['file'] = os.path.join(
+                settings.PROFILE_DIR,
+                '{0}-{1}-{2}.prof'.format(
+                    time.strftime('%Y%m%d-%H%M%S'),
+                    request.method,
+                    re.sub(r'\W+', '_', request.path).strip('_')
+                )
+            )
+            profiler.dump_stats(report['file'])
+
+        return JsonResponse(report)
@@ -0,0 +1,148 @@
+"""
+Fast read-only representation of recipes.
+Builds the same output as RecipeSerializer from stored recipe cards
+and per-user flags, without DRF fields machinery.
+"""
+from food.models import Recipe, RecipeCard
+from users.models import Cart, Favorites, Subscription
+from .sparse import sparse_fields
+
+RECIPE_FIELDS = (
+    'id',
+    'tags',
+    'author',
+    'ingredients',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'name',
+    'image',
+    'text',
+    'cooking_time'
+)
+RECIPE_COLUMNS = ('name', 'image', 'text', 'cooking_time')
+
+
+def image_url(name, request=None):
+    """Same as ImageField.to_representation."""
+    if not name:
+        return None
+    url = Recipe._meta.get_field('image').storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+
+    return url
+
+
+def user_flags(user, favorite_pks, cart_pks, author_pks):
+    """
+    Returns sets of favorited and carted recipes and followed authors.
+    Empty list of pks makes no query.
+    """
+    if not user.is_authenticated:
+        return set(), set(), set()
+
+    return (
+        set(Favorites.objects.filter(
+            user=user, recipe__in=favorite_pks
+        ).values_list('recipe', flat=True)),
+        set(Cart.objects.filter(
+            user=user, recipe__in=cart_pks
+        ).values_list('recipe', flat=True)),
+        set(Subscription.objects.filter(
+            follower=user, followed__in=author_pks
+        ).values_list('followed', flat=True)),
+    )
+
+
+def with_user_flags(cards, request):
+    """
+    Returns list of representations with flags of request.user,
+    in order of cards, field order same as RecipeSerializer.
+    """
+    pks = [card['id'] for card in cards]
+    favorited, in_cart, followed = user_flags(
+        request.user,
+        pks,
+        pks,
+        {card['author']['id'] for card in cards}
+    )
+
+    return [
+        {
+            'id': card['id'],
+            'tags': card['tags'],
+            'author': {
+                **card['author'],
+                'is_subscribed': card['author']['id'] in followed,
+            },
+            'ingredients': card['ingredients'],
+            'is_favorited': card['id'] in favorited,
+            'is_in_shopping_cart': card['id'] in in_cart,
+            'name': card['name'],
+            'image': image_url(card['image'], request),
+            'text': card['text'],
+            'cooking_time': card['cooking_time'],
+        }
+        for card in cards
+    ]
+
+
+def sparse_with_user_flags(cards, request, fields):
+    """
+    Same as with_user_flags for some fields only.
+    Flags of fields not asked are not queried.
+    """
+    pks = [card['id'] for card in cards]
+    favorited, in_cart, followed = user_flags(
+        request.user,
+        pks if 'is_favorited' in fields else [],
+        pks if 'is_in_shopping_cart' in fields else [],
+        {card['author']['id'] for card in cards} if 'author' in fields else []
+    )
+    values = {
+        'author': lambda card: {
+            **card['author'],
+            'is_subscribed': card['author']['id'] in followed,
+        },
+        'is_favorited': lambda card: card['id'] in favorited,
+        'is_in_shopping_cart': lambda card: card['id'] in in_cart,
+        'image': lambda card: image_url(card['image'], request),
+    }
+
+    return [
+        {
+            field: values[field](card) if field in values else card[field]
+            for field in fields
+        }
+        for card in cards
+    ]
+
+
+def recipes_representation(pks, request):
+    """
+    Representation of recipes in order of pks, as RecipeSerializer.
+    Without tags, author and ingredients asked plain columns of recipes
+    are read instead of whole cards.
+    """
+    fields = sparse_fields(request, RECIPE_FIELDS)
+    if fields == RECIPE_FIELDS:
+        cards = RecipeCard.objects.documents(pks)
+
+        return with_user_flags(
+            [cards[pk] for pk in pks if pk in cards], request
+        )
+
+    if {'tags', 'author', 'ingredients'}.isdisjoint(fields):
+        columns = [column for column in RECIPE_COLUMNS if column in fields]
+        cards = {
+            recipe['id']: recipe
+            for recipe in Recipe.objects.filter(pk__in=pks).values(
+                'id', *columns
+            )
+        }
+    else:
+        cards = RecipeCard.objects.documents(pks)
+
+    return sparse_with_user_flags(
+        [cards[pk] for pk in pks if pk in cards], request, fields
+    )
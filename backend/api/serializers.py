@@ -1,5 +1,6 @@
 import base64
 
+from django.conf import settings
 from django.core.files.base import ContentFile
 from django.db import transaction
 from django.shortcuts import get_object_or_404
@@ -8,7 +9,12 @@ from rest_framework import serializers
 from rest_framework.exceptions import NotFound
 
 from food.models import Ingredient, IngredientThrough, Recipe, Tag, User
-from users.models import Cart, Favorites, Subscription
+from users.models import (Cart, Favorites, FeedEntry, ShoppingListItem,
+                          Subscription)
+from .sparse import sparse_fields
+from .uploads import image_from_token
+
+BATCH_LIMIT = 100
 
 
 class UserFilterMixin():
@@ -22,6 +28,22 @@ class UserFilterMixin():
         return False
 
 
+class SparseFieldsMixin():
+    """Top level serializer drops fields not asked by request."""
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+
+        return {
+            name: fields[name]
+            for name in sparse_fields(self.context.get('request'), fields)
+        }
+
+
 class RecipeSerializerCommon(serializers.ModelSerializer, UserFilterMixin):
     """Common base for inheritance. DRY."""
     class Meta:
@@ -49,12 +71,26 @@ class RecipeSerializerCommon(serializers.ModelSerializer, UserFilterMixin):
 
 
 class DecodeImageField(serializers.ImageField):
-    """Image field in Base64 encoding."""
+    """
+    Image field in Base64 encoding.
+    Other strings are tokens of images uploaded to recipes/images/.
+    """
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
+            if len(imgstr) * 3 // 4 > settings.RECIPE_IMAGE_MAX_BYTES:
+                raise serializers.ValidationError('Image is too large.')
             ext = format.split('/')[-1]
             data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+        elif isinstance(data, str):
+            name = image_from_token(data, self.context['request'].user)
+            storage = Recipe._meta.get_field('image').storage
+            if name is None or not storage.exists(name):
+                raise serializers.ValidationError(
+                    'Invalid or expired image token.'
+                )
+
+            return name
 
         return super().to_internal_value(data)
 
@@ -116,7 +152,11 @@ class TagsSerializer(serializers.ModelSerializer):
         return Tag.objects.get(id=data)
 
 
-class UserSerializer(serializers.ModelSerializer, UserFilterMixin):
+class UserSerializer(
+    SparseFieldsMixin,
+    serializers.ModelSerializer,
+    UserFilterMixin
+):
     """Serializer for User model."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -132,7 +172,13 @@ class UserSerializer(serializers.ModelSerializer, UserFilterMixin):
         )
 
     def get_is_subscribed(self, object):
-        """If user is subscribed on object - returns True."""
+        """
+        If user is subscribed on object - returns True.
+        Annotated by UserQuerySet.with_subscription when possible.
+        """
+        if hasattr(object, 'is_subscribed'):
+            return object.is_subscribed
+
         user = self.context['request'].user
 
         return self.user_is_on_it(
@@ -169,18 +215,22 @@ class RecipeInclusionSerializer(RecipeSerializerCommon):
         user = self.context['request'].user
         model = data.get('model')
         recipe = get_object_or_404(Recipe, pk=data.get('pk'))
-        if model.objects.filter(recipe=recipe, user=user).exists():
-            raise serializers.ValidationError({
-                'non_fields_error':
-                f'{model._meta.verbose_name} object already exists'
-            })
-
-        model.objects.create(recipe=recipe, user=user)
+        with transaction.atomic():
+            User.objects.lock(user)
+            if model.objects.filter(recipe=recipe, user=user).exists():
+                raise serializers.ValidationError({
+                    'non_fields_error':
+                    f'{model._meta.verbose_name} object already exists'
+                })
+
+            model.objects.create(recipe=recipe, user=user)
+            if model is Cart:
+                ShoppingListItem.objects.add_recipes(user, [recipe.pk])
 
         return recipe
 
 
-class RecipeSerializer(RecipeSerializerCommon):
+class RecipeSerializer(SparseFieldsMixin, RecipeSerializerCommon):
     """Serializer for Recipe model."""
     ingredients = IngredientSerializer(many=True)
     tags = TagsSerializer(many=True)
@@ -219,15 +269,18 @@ class RecipeSerializer(RecipeSerializerCommon):
             if not value:
                 raise serializers.ValidationError(f'Empty value: {key}')
 
-        image = validated_data.pop('image')
-        if Recipe.objects.filter(**validated_data).exists():
+        recipe = Recipe(**validated_data)
+        if Recipe.objects.filter(
+            content_hash=recipe.get_content_hash()
+        ).exists():
             raise serializers.ValidationError(
                 'You already created this recipe'
             )
 
-        recipe = Recipe.objects.create(**validated_data, image=image)
+        recipe.save()
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        transaction.on_commit(lambda: FeedEntry.objects.fan_out(recipe))
 
         return recipe
 
@@ -265,8 +318,14 @@ class RecipeSerializer(RecipeSerializerCommon):
             instance.tags.set(tags)
 
         if ingredients:
+            old = ShoppingListItem.objects.recipes_amounts([instance.pk], -1)
             instance.ingredients.all().delete()
             self.create_ingredients(ingredients, instance)
+            new = ShoppingListItem.objects.recipes_amounts([instance.pk])
+            ShoppingListItem.objects.apply(
+                list(instance.carts.values_list('user', flat=True)),
+                {pk: old.get(pk, 0) + new.get(pk, 0) for pk in old | new}
+            )
 
         return super().update(instance, validated_data)
 
@@ -274,10 +333,7 @@ class RecipeSerializer(RecipeSerializerCommon):
 class UserSubscriptionsSerializer(UserSerializer):
     """Serializer for subscriptions of User model."""
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.IntegerField(
-        source='recipes.count',
-        read_only=True
-    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UserSerializer.Meta):
         fields = (
@@ -309,6 +365,42 @@ class UserSubscriptionsSerializer(UserSerializer):
         return serializer.data
 
 
+class ShoppingListSerializer(serializers.ModelSerializer):
+    """Serializer for ShoppingListItem model."""
+    id = serializers.IntegerField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class ImageUploadSerializer(serializers.Serializer):
+    """Serializer for image file uploaded for recipe."""
+    image = serializers.ImageField()
+
+
+class SyncSerializer(serializers.Serializer):
+    """Serializer for cursor of sync clients."""
+    since = serializers.IntegerField(min_value=0, required=False)
+
+
+class BatchIdsSerializer(serializers.Serializer):
+    """Serializer for list of ids used by batch actions."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_LIMIT
+    )
+
+    def validate_ids(self, value):
+        """Drop repeated ids but keep the order they came in."""
+        return list(dict.fromkeys(value))
+
+
 class SubscriptionsSerializer(serializers.ModelSerializer):
     """Serializer for Subscription modedl."""
     class Meta:
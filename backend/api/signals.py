@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backend.invalidation import bump
+from food.models import Ingredient, Recipe, Tag
+from food.signals import cards_refreshed, recipes_deleting
+from users.models import Cart, Favorites, Subscription, User
+from users.signals import links_changed
+from .caching import invalidate_pages
+
+
+@receiver(cards_refreshed)
+def invalidate_pages_on_change(sender, **kwargs):
+    """Recipe, its tags, ingredients or author changed."""
+    invalidate_pages()
+
+
+@receiver(recipes_deleting)
+def invalidate_pages_on_delete(sender, **kwargs):
+    transaction.on_commit(invalidate_pages)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Favorites)
+@receiver(post_save, sender=Cart)
+@receiver(post_save, sender=Subscription)
+def bump_on_save(sender, update_fields=None, **kwargs):
+    """Logins change nothing cached."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+
+    bump(sender)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_on_delete(sender, **kwargs):
+    bump(sender)
+
+
+@receiver(post_delete, sender=User)
+def bump_on_user_delete(sender, **kwargs):
+    """Links of user are deleted by cascade, without signals."""
+    bump(User, Favorites, Cart, Subscription)
+
+
+@receiver(recipes_deleting)
+def bump_on_recipes_delete(sender, **kwargs):
+    """Links of recipes are deleted by cascade, without signals."""
+    bump(Recipe, Favorites, Cart)
+
+
+@receiver(links_changed)
+def bump_on_links_change(sender, **kwargs):
+    bump(sender)
@@ -0,0 +1,46 @@
+"""
+Sparse fieldsets.
+Safe requests may ask only some fields of response with ?fields=id,name
+or drop some with ?omit=text. Omitted fields are not loaded at all.
+"""
+from rest_framework.permissions import SAFE_METHODS
+
+USER_COLUMNS = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+def query_names(request, param):
+    """Comma separated names from all values of query parameter."""
+    return {
+        name.strip()
+        for value in request.query_params.getlist(param)
+        for name in value.split(',')
+        if name.strip()
+    }
+
+
+def sparse_fields(request, fields):
+    """
+    Returns fields asked by request, in order of fields.
+    Unknown names are ignored, unsafe requests always get all fields.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return tuple(fields)
+
+    wanted = query_names(request, 'fields')
+    omitted = query_names(request, 'omit')
+
+    return tuple(
+        field for field in fields
+        if (not wanted or field in wanted) and field not in omitted
+    )
+
+
+def prune_users(queryset, fields):
+    """Loads only columns of fields and counts recipes only if asked."""
+    queryset = queryset.only(
+        'id', *(column for column in USER_COLUMNS if column in fields)
+    )
+    if 'recipes_count' in fields:
+        queryset = queryset.with_recipes_count()
+
+    return queryset
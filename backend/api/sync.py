@@ -0,0 +1,56 @@
+"""
+Changes since cursor for clients keeping their own copy of data.
+Client takes cursor first, then downloads full lists, then asks for
+changes since cursor and gets next cursor with them.
+"""
+from django.conf import settings
+
+from food.models import Change, Ingredient, Tag
+from .representations import recipes_representation
+
+# Response key and key pair of changed and deleted objects of every kind.
+SECTIONS = {
+    Change.Kind.RECIPE: ('recipes', 'updated', 'deleted'),
+    Change.Kind.TAG: ('tags', 'updated', 'deleted'),
+    Change.Kind.INGREDIENT: ('ingredients', 'updated', 'deleted'),
+    Change.Kind.FAVORITE: ('favorites', 'added', 'removed'),
+    Change.Kind.CART: ('shopping_cart', 'added', 'removed'),
+    Change.Kind.SUBSCRIPTION: ('subscriptions', 'added', 'removed'),
+}
+
+
+def changes_since(request, since):
+    """
+    Returns changes visible to request.user made after cursor since,
+    at most SYNC_PAGE_SIZE of them. Only last change of object counts.
+    Changes after horizon wait for next request.
+    """
+    changes = list(Change.objects.visible_to(request.user).filter(
+        id__gt=since,
+        created__lte=Change.objects.horizon()
+    ).order_by('id').values_list(
+        'id', 'kind', 'object_id', 'deleted'
+    )[:settings.SYNC_PAGE_SIZE + 1])
+    more = len(changes) > settings.SYNC_PAGE_SIZE
+    changes = changes[:settings.SYNC_PAGE_SIZE]
+    latest = {}
+    for _, kind, pk, deleted in changes:
+        latest[kind, pk] = deleted
+    ids = {kind: ([], []) for kind in SECTIONS}
+    for (kind, pk), deleted in latest.items():
+        ids[kind][deleted].append(pk)
+
+    body = {'cursor': changes[-1][0] if changes else since, 'more': more}
+    for kind, (key, changed, deleted) in SECTIONS.items():
+        body[key] = {changed: ids[kind][False], deleted: ids[kind][True]}
+    body['recipes']['updated'] = recipes_representation(
+        ids[Change.Kind.RECIPE][False], request
+    )
+    body['tags']['updated'] = list(Tag.objects.filter(
+        pk__in=ids[Change.Kind.TAG][False]
+    ).values('id', 'name', 'color', 'slug'))
+    body['ingredients']['updated'] = list(Ingredient.objects.filter(
+        pk__in=ids[Change.Kind.INGREDIENT][False]
+    ).values('id', 'name', 'measurement_unit'))
+
+    return body
@@ -0,0 +1,394 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import (APIClient, APIRequestFactory,
+                                 force_authenticate)
+
+from backend.invalidation import DatabaseVersions, LocalCache
+from food.models import Change, Ingredient, IngredientThrough, Recipe, Tag
+from users.models import (Cart, Favorites, ShoppingListItem, Subscription,
+                          User)
+from .filters import RecipeFilter
+from .profiling import profile_requested
+from .representations import recipes_representation
+from .serializers import RecipeSerializer
+from .throttles import CounterScopedThrottle
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='password',
+        first_name=username.title(),
+        last_name='Cook'
+    )
+
+
+def create_recipe(author, name, ingredients, tags=(), image=''):
+    """Recipe with {ingredient: amount} ingredients."""
+    recipe = Recipe.objects.create(
+        author=author,
+        name=name,
+        image=image,
+        text=f'How to cook {name}',
+        cooking_time=len(name)
+    )
+    recipe.tags.set(tags)
+    IngredientThrough.objects.bulk_create(
+        IngredientThrough(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in ingredients.items()
+    )
+
+    return recipe
+
+
+def api_request(user=None, path='/api/recipes/'):
+    request = APIRequestFactory().get(path)
+    if user is not None:
+        force_authenticate(request, user)
+
+    return Request(request)
+
+
+class RecipesRepresentationTests(TestCase):
+    """Fast representation renders same bytes as RecipeSerializer."""
+    def setUp(self):
+        self.reader = create_user('reader')
+        self.author = create_user('author')
+        self.other_author = create_user('other')
+        Subscription.objects.create(follower=self.reader, followed=self.author)
+        breakfast = Tag.objects.create(
+            name='Breakfast', color='#E26C2D', slug='breakfast'
+        )
+        dinner = Tag.objects.create(
+            name='Dinner', color='#49B64E', slug='dinner'
+        )
+        salt, flour, eggs = (
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('salt', 'g'), ('flour', 'g'), ('eggs', 'pc'))
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes = [
+                create_recipe(
+                    self.author, 'pancakes', {flour: 200, eggs: 2, salt: 1},
+                    tags=(breakfast, dinner),
+                    image='recipes/images/pancakes.png'
+                ),
+                create_recipe(
+                    self.author, 'bread', {flour: 500, salt: 10},
+                    tags=(dinner,)
+                ),
+                create_recipe(
+                    self.other_author, 'omelette', {eggs: 3},
+                    image='recipes/images/omelette.png'
+                ),
+                create_recipe(self.other_author, 'boiled eggs', {eggs: 4}),
+            ]
+        Favorites.objects.create(user=self.reader, recipe=self.recipes[0])
+        Favorites.objects.create(user=self.reader, recipe=self.recipes[2])
+        Cart.objects.create(user=self.reader, recipe=self.recipes[0])
+        Cart.objects.create(user=self.reader, recipe=self.recipes[1])
+
+    def assert_same_as_serializer(self, request):
+        pks = [recipe.pk for recipe in reversed(self.recipes)]
+        recipes = sorted(
+            Recipe.objects.filter(pk__in=pks),
+            key=lambda recipe: pks.index(recipe.pk)
+        )
+        expected = RecipeSerializer(
+            recipes, many=True, context={'request': request}
+        ).data
+        self.assertEqual(
+            JSONRenderer().render(recipes_representation(pks, request)),
+            JSONRenderer().render(expected)
+        )
+
+    def test_authenticated(self):
+        self.assert_same_as_serializer(api_request(self.reader))
+
+    def test_anonymous(self):
+        self.assert_same_as_serializer(api_request())
+
+    def test_sparse_fields(self):
+        for fields in (
+            'id,name,is_favorited,is_in_shopping_cart',
+            'author,image',
+            'tags,ingredients,cooking_time',
+        ):
+            with self.subTest(fields=fields):
+                self.assert_same_as_serializer(api_request(
+                    self.reader, f'/api/recipes/?fields={fields}'
+                ))
+
+
+class RecipeFilterTests(TestCase):
+    """Flags of user filter by correlated EXISTS and NOT EXISTS."""
+    def setUp(self):
+        self.reader = create_user('reader')
+        author = create_user('author')
+        salt = Ingredient.objects.create(name='salt', measurement_unit='g')
+        self.liked, self.bought, self.both, self.none = (
+            create_recipe(author, name, {salt: 1})
+            for name in ('liked', 'bought', 'both', 'none')
+        )
+        for recipe in (self.liked, self.both):
+            Favorites.objects.create(user=self.reader, recipe=recipe)
+        for recipe in (self.bought, self.both):
+            Cart.objects.create(user=self.reader, recipe=recipe)
+        # Links of other users must not count.
+        Favorites.objects.create(user=author, recipe=self.none)
+        Cart.objects.create(user=author, recipe=self.none)
+
+    def filtered(self, user=None, **data):
+        return RecipeFilter(
+            data=data,
+            queryset=Recipe.objects.all(),
+            request=api_request(user)
+        ).qs
+
+    def assert_recipes(self, queryset, recipes):
+        self.assertEqual(
+            sorted(queryset.values_list('pk', flat=True)),
+            sorted(recipe.pk for recipe in recipes)
+        )
+
+    def test_plans_are_semi_and_anti_joins(self):
+        for name in ('is_favorited', 'is_in_shopping_cart'):
+            for value, condition in (('1', 'EXISTS'), ('0', 'NOT EXISTS')):
+                with self.subTest(name=name, value=value):
+                    sql = str(self.filtered(
+                        self.reader, **{name: value}
+                    ).query)
+                    self.assertIn(condition, sql)
+                    self.assertNotIn('JOIN', sql)
+                    self.assertNotIn('DISTINCT', sql)
+                    if value == '1':
+                        self.assertNotIn('NOT EXISTS', sql)
+
+    def test_is_favorited(self):
+        self.assert_recipes(
+            self.filtered(self.reader, is_favorited='1'),
+            (self.liked, self.both)
+        )
+        self.assert_recipes(
+            self.filtered(self.reader, is_favorited='0'),
+            (self.bought, self.none)
+        )
+
+    def test_is_in_shopping_cart(self):
+        self.assert_recipes(
+            self.filtered(self.reader, is_in_shopping_cart='1'),
+            (self.bought, self.both)
+        )
+        self.assert_recipes(
+            self.filtered(self.reader, is_in_shopping_cart='0'),
+            (self.liked, self.none)
+        )
+
+    def test_both_flags(self):
+        self.assert_recipes(
+            self.filtered(
+                self.reader, is_favorited='0', is_in_shopping_cart='0'
+            ),
+            (self.none,)
+        )
+        self.assert_recipes(
+            self.filtered(
+                self.reader, is_favorited='1', is_in_shopping_cart='0'
+            ),
+            (self.liked,)
+        )
+
+    def test_user_without_links(self):
+        user = create_user('newcomer')
+        self.assert_recipes(self.filtered(user, is_favorited='1'), ())
+        self.assert_recipes(
+            self.filtered(user, is_in_shopping_cart='0'),
+            (self.liked, self.bought, self.both, self.none)
+        )
+
+    def test_anonymous(self):
+        self.assert_recipes(self.filtered(is_favorited='1'), ())
+        self.assert_recipes(
+            self.filtered(is_in_shopping_cart='0'),
+            (self.liked, self.bought, self.both, self.none)
+        )
+
+
+class CartDeleteTests(TestCase):
+    """Deleting cart entry twice takes its amounts once."""
+    def setUp(self):
+        self.reader = create_user('reader')
+        self.salt = Ingredient.objects.create(
+            name='salt', measurement_unit='g'
+        )
+        self.bread, self.soup = (
+            create_recipe(self.reader, name, {self.salt: amount})
+            for name, amount in (('bread', 5), ('soup', 10))
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        for recipe in (self.bread, self.soup):
+            self.client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+
+    def test_second_delete_changes_nothing(self):
+        url = f'/api/recipes/{self.bread.pk}/shopping_cart/'
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        self.assertEqual(
+            dict(ShoppingListItem.objects.filter(
+                user=self.reader
+            ).values_list('ingredient', 'amount')),
+            {self.salt.pk: 10}
+        )
+
+
+@override_settings(SYNC_SETTLE_SECONDS=5)
+class SyncHorizonTests(TestCase):
+    """Changes younger than horizon may be followed by lower ids."""
+    def setUp(self):
+        self.tags = [
+            Tag.objects.create(name=name, color=color, slug=name)
+            for name, color in (('soup', '#111111'), ('cake', '#222222'))
+        ]
+        self.changes = Change.objects.bulk_create(
+            Change(kind=Change.Kind.TAG, object_id=tag.pk)
+            for tag in self.tags
+        )
+        Change.objects.filter(pk=self.changes[0].pk).update(
+            created=timezone.now() - timedelta(seconds=10)
+        )
+
+    def sync(self, **params):
+        response = APIClient().get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+    def test_cursor_stops_before_horizon(self):
+        self.assertEqual(self.sync(), {'cursor': self.changes[0].pk})
+
+    def test_changes_stop_before_horizon(self):
+        body = self.sync(since=0)
+        self.assertEqual(body['cursor'], self.changes[0].pk)
+        self.assertEqual(
+            [tag['id'] for tag in body['tags']['updated']],
+            [self.tags[0].pk]
+        )
+
+    def test_settled_changes_are_returned_later(self):
+        cursor = self.sync(since=0)['cursor']
+        with override_settings(SYNC_SETTLE_SECONDS=0):
+            body = self.sync(since=cursor)
+        self.assertEqual(body['cursor'], self.changes[1].pk)
+        self.assertEqual(
+            [tag['id'] for tag in body['tags']['updated']],
+            [self.tags[1].pk]
+        )
+
+
+class DatabaseVersionsTests(TestCase):
+    """Versions in database are seen by every worker."""
+    def test_bump_is_seen_by_other_worker(self):
+        worker, other = DatabaseVersions(), DatabaseVersions()
+        worker.bump(['food.Tag'])
+        worker.bump(['food.Tag', 'users.Cart'])
+        self.assertEqual(
+            other.get(['food.Tag', 'users.Cart', 'food.Recipe']),
+            {'food.Tag': 2, 'users.Cart': 1, 'food.Recipe': 0}
+        )
+
+    def test_local_cache_drops_value_after_write(self):
+        cache = LocalCache(Tag)
+        self.assertEqual(cache.get_or_set(None, lambda: 'first'), 'first')
+        self.assertEqual(cache.get_or_set(None, lambda: 'second'), 'first')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Soup', color='#333333', slug='soup')
+        self.assertEqual(cache.get_or_set(None, lambda: 'third'), 'third')
+
+
+class CounterScopedThrottleTests(SimpleTestCase):
+    """
+    Two throttles, as in two workers, with own clients of one cache
+    store and clock at given second.
+    """
+    def setUp(self):
+        self.now = 0
+        self.workers = [self.throttle(), self.throttle()]
+        self.request = api_request()
+        self.view = SimpleNamespace(throttle_scope='test')
+
+    def tearDown(self):
+        self.workers[0].cache.clear()
+
+    def throttle(self):
+        throttle = CounterScopedThrottle()
+        throttle.THROTTLE_RATES = {'test': '4/minute'}
+        throttle.cache = LocMemCache('throttle-tests', {})
+        throttle.timer = lambda: self.now
+
+        return throttle
+
+    def allowed(self, count):
+        """Number of count requests allowed, workers taking turns."""
+        return sum(
+            self.workers[number % 2].allow_request(self.request, self.view)
+            for number in range(count)
+        )
+
+    def test_limit_is_shared_by_workers(self):
+        self.assertEqual(self.allowed(10), 4)
+
+    def test_rejected_requests_are_not_counted(self):
+        self.allowed(10)
+        self.now = 90
+        self.assertEqual(self.allowed(10), 2)
+
+    def test_previous_window_is_weighted(self):
+        self.allowed(4)
+        self.now = 75
+        self.assertEqual(self.allowed(10), 1)
+        self.now = 105
+        self.assertEqual(self.allowed(10), 2)
+
+    def test_counters_reset_after_windows(self):
+        self.allowed(4)
+        self.now = 120
+        self.assertEqual(self.allowed(10), 4)
+
+    def test_wait_until_window_slides(self):
+        self.now = 10
+        self.allowed(5)
+        self.assertEqual(self.workers[0].wait(), 50)
+        self.now = 90
+        self.allowed(5)
+        self.assertEqual(self.workers[0].wait(), 15)
+
+    def test_views_without_scope_are_not_throttled(self):
+        self.allowed(4)
+        self.view.throttle_scope = None
+        self.assertEqual(self.allowed(10), 10)
+
+
+class ProfileRequestedTests(SimpleTestCase):
+    def test_only_one_turns_profiling_on(self):
+        factory = APIRequestFactory()
+        for value, requested in (
+            ('1', True), ('0', False), ('false', False), ('', False)
+        ):
+            with self.subTest(value=value):
+                self.assertIs(
+                    profile_requested(factory.get('/', {'_profile': value})),
+                    requested
+                )
+                self.assertIs(
+                    profile_requested(factory.get('/', HTTP_X_PROFILE=value)),
+                    requested
+                )
+        self.assertIs(profile_requested(factory.get('/')), False)
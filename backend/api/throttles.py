@@ -0,0 +1,64 @@
+"""
+Throttling on atomic counters of the cache.
+DRF throttles keep list of request timestamps per client and rewrite it
+on every request, so concurrent workers overwrite each other's history.
+Here every window is a single counter changed by atomic incr.
+"""
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class CounterScopedThrottle(ScopedRateThrottle):
+    """
+    Sliding window counter throttle, scope is taken from view.throttle_scope.
+    Requests in previous window are weighted by part of it that is still
+    inside sliding window. Clients are users or, for anonymous, addresses.
+    Counters are shared by workers only if cache is (CACHE_LOCATION).
+    """
+    def window_key(self, window):
+        return f'{self.key}_{window}'
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, elapsed = divmod(self.now, self.duration)
+        current = self.window_key(int(window))
+        self.cache.add(current, 0, self.duration * 2)
+        try:
+            self.count = self.cache.incr(current)
+        except ValueError:
+            # Counter expired between add and incr.
+            self.cache.add(current, 1, self.duration * 2)
+            self.count = 1
+        self.previous = self.cache.get(self.window_key(int(window) - 1), 0)
+        self.weight = 1 - elapsed / self.duration
+        if self.previous * self.weight + self.count > self.num_requests:
+            # Rejected requests are not counted.
+            self.cache.decr(current)
+
+            return self.throttle_failure()
+
+        return self.throttle_success()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        """
+        Seconds until enough of previous window slides out,
+        or until current window ends if it is full by itself.
+        """
+        if self.previous and self.count <= self.num_requests:
+            return self.duration * (
+                self.weight - (self.num_requests - self.count) / self.previous
+            )
+
+        return self.duration * self.weight
@@ -0,0 +1,71 @@
+"""
+Recipe images uploaded as files instead of base64 inside JSON.
+File is streamed to disk in chunks and saved to media storage,
+client gets signed token to put into image field of recipe.
+Images no recipe took are removed by gc_media.
+"""
+import os
+from uuid import uuid4
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.uploadhandler import (SkipFile,
+                                             TemporaryFileUploadHandler)
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from food.models import Recipe
+
+TOKEN_SALT = 'api.uploads.image'
+
+# Room for boundaries and headers of multipart body around the file.
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class ImageTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Image is too large.'
+    default_code = 'image_too_large'
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Writes upload to temporary file chunk by chunk, up to size limit."""
+    too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.too_large = True
+            raise SkipFile()
+
+        return super().receive_data_chunk(raw_data, start)
+
+
+def save_image(file):
+    """Saves file under random name. Returns its storage name."""
+    field = Recipe._meta.get_field('image')
+    extension = os.path.splitext(file.name)[1].lower()
+
+    return field.storage.save(
+        field.generate_filename(None, uuid4().hex + extension), file
+    )
+
+
+def image_token(name, user):
+    return signing.dumps({'name': name, 'user': user.pk}, salt=TOKEN_SALT)
+
+
+def image_from_token(token, user):
+    """Returns name of image uploaded by user, None for bad token."""
+    try:
+        data = signing.loads(
+            token,
+            salt=TOKEN_SALT,
+            max_age=settings.RECIPE_IMAGE_TOKEN_SECONDS
+        )
+    except signing.BadSignature:
+        return None
+
+    if data['user'] != user.pk:
+        return None
+
+    return data['name']
@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagsViewSet, UsersViewSet
+from . import async_views
+from .views import (IngredientViewSet, RecipeViewSet, SyncViewSet, TagsViewSet,
+                    UsersViewSet)
 
 app_name = 'api'
 
@@ -10,8 +13,34 @@ router.register('recipes', RecipeViewSet, basename='recipe')
 router.register('tags', TagsViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('users', UsersViewSet, basename='users')
+router.register('sync', SyncViewSet, basename='sync')
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    async_routes = (
+        ('recipes/', async_views.recipes_list, RecipeViewSet,
+         {'get': 'list', 'post': 'create'}),
+        ('recipes/<int:pk>/', async_views.recipe_detail, RecipeViewSet,
+         {'get': 'retrieve', 'put': 'update',
+          'patch': 'partial_update', 'delete': 'destroy'}),
+        ('tags/', async_views.tags_list, TagsViewSet, {'get': 'list'}),
+        ('tags/<int:pk>/', async_views.tag_detail, TagsViewSet,
+         {'get': 'retrieve'}),
+        ('ingredients/', async_views.ingredients_list, IngredientViewSet,
+         {'get': 'list'}),
+        ('ingredients/<int:pk>/', async_views.ingredient_detail,
+         IngredientViewSet, {'get': 'retrieve'}),
+        ('users/subscriptions/', async_views.subscriptions, UsersViewSet,
+         {'get': 'subscriptions'}),
+    )
+    urlpatterns = [
+        path(
+            route,
+            async_views.safe_methods_only(viewset.as_view(actions))(view)
+        )
+        for route, view, viewset, actions in async_routes
+    ] + urlpatterns
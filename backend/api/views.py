@@ -1,20 +1,61 @@
-from django.db.models import Q, Sum
-from django.http import FileResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjUserViewSet
 from rest_framework import mixins, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
-from food.models import Ingredient, IngredientThrough, Recipe, Tag
-from users.models import Cart, Favorites, Subscription, User
-from .filters import IngredientFilter, RecipeFilter
+from backend.invalidation import LocalCache
+from food.models import Change, Ingredient, Recipe, SimilarRecipe, Tag
+from users.models import (Cart, Favorites, FeedEntry, ShoppingListItem,
+                          Subscription, User)
+from .caching import cached_page
+from .filters import IngredientFilter, RecipeFilter, UserFilter
+from .paginators import FeedPagination
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (IngredientShowSerializer, RecipeInclusionSerializer,
-                          RecipeSerializer, SubscriptionsSerializer,
-                          TagsSerializer, UserSubscriptionsSerializer)
+from .representations import recipes_representation
+from .serializers import (BatchIdsSerializer, ImageUploadSerializer,
+                          IngredientShowSerializer, RecipeInclusionSerializer,
+                          RecipeSerializer, ShoppingListSerializer,
+                          SubscriptionsSerializer, SyncSerializer,
+                          TagsSerializer, UserSerializer,
+                          UserSubscriptionsSerializer)
+from .sparse import prune_users, sparse_fields
+from .sync import changes_since
+from .uploads import (MULTIPART_OVERHEAD, ImageTooLarge,
+                      LimitedUploadHandler, image_token, save_image)
+
+BATCH_ACTIONS = ('shopping_cart_batch', 'favorite_batch', 'subscribe_batch')
+
+# Tags and ingredients change rarely, their lists are kept in process.
+TAGS_CACHE = LocalCache(Tag, max_size=1)
+INGREDIENTS_CACHE = LocalCache(Ingredient)
+
+# Tag counts under filters of a user change with favorites and carts too.
+FACETS_CACHE = LocalCache(Recipe, Tag, max_size=1024)
+USER_FACETS_CACHE = LocalCache(Recipe, Tag, Favorites, Cart, max_size=1024)
+USER_FILTERS = {'is_favorited', 'is_in_shopping_cart'}
+
+
+def batch_outcomes(ids, missing, linked, done_status, skip_status):
+    """Returns per-id outcome of batch action in order of requested ids."""
+    outcomes = []
+    for pk in ids:
+        if pk in missing:
+            outcome = 'not_found'
+        elif pk in linked:
+            outcome = done_status
+        else:
+            outcome = skip_status
+        outcomes.append({'id': pk, 'status': outcome})
+
+    return outcomes
 
 
 class IngredientViewSet(
@@ -29,6 +70,16 @@ class IngredientViewSet(
     permission_classes = [AllowAny]
     allowed_methods = ['GET']
     filterset_class = IngredientFilter
+    throttle_scope = 'ingredients'
+
+    def list(self, request, *args, **kwargs):
+        """Lists are cached by searched name."""
+        return Response(INGREDIENTS_CACHE.get_or_set(
+            request.query_params.get('name', ''),
+            lambda: list(self.get_serializer(
+                self.filter_queryset(self.get_queryset()), many=True
+            ).data)
+        ))
 
 
 class RecipeViewSet(ModelViewSet):
@@ -36,6 +87,7 @@ class RecipeViewSet(ModelViewSet):
     serializer_class = RecipeSerializer
     permission_classes = [IsAuthorOrReadOnly]
     filterset_class = RecipeFilter
+    throttle_scope = None
 
     def get_queryset(self):
         """Returns queryset with filtering by tags and date."""
@@ -48,10 +100,48 @@ class RecipeViewSet(ModelViewSet):
             condition
         ).order_by('-date_created').distinct()
 
+    def get_throttles(self):
+        """Writes with big base64 images are throttled."""
+        if self.action in ('create', 'update', 'partial_update'):
+            self.throttle_scope = 'recipe_write'
+
+        return super().get_throttles()
+
+    def _list_data(self, request):
+        """Page of recipes built by fast read-only representation."""
+        queryset = self.filter_queryset(
+            self.get_queryset()
+        ).values_list('pk', flat=True)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                recipes_representation(list(page), request)
+            ).data
+
+        return recipes_representation(list(queryset), request)
+
+    def list(self, request, *args, **kwargs):
+        """Pages for anonymous users are the same for all, so cached."""
+        if request.user.is_authenticated:
+            return Response(self._list_data(request))
+
+        return Response(
+            cached_page(request, lambda: self._list_data(request))
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Recipe built by fast read-only representation."""
+        return Response(
+            recipes_representation([self.get_object().pk], request)[0]
+        )
+
     def get_serializer_class(self):
         if self.action in ('shopping_cart', 'favorite'):
             return RecipeInclusionSerializer
 
+        if self.action in BATCH_ACTIONS:
+            return BatchIdsSerializer
+
         return super().get_serializer_class()
 
     def _lazy_action(self, request, pk, model):
@@ -64,24 +154,154 @@ class RecipeViewSet(ModelViewSet):
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        get_object_or_404(model, recipe__pk=pk, user=request.user).delete()
+        with transaction.atomic():
+            User.objects.lock(request.user)
+            deleted, _ = model.objects.filter(
+                recipe__pk=pk,
+                user=request.user
+            ).delete()
+            if not deleted:
+                raise Http404
+            if model is Cart:
+                ShoppingListItem.objects.remove_recipes(request.user, [pk])
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def _batch_action(self, request, model):
+        """
+        DRY for batch actions.
+        Adds or removes many recipes at once with bulk statements
+        inside one transaction and reports outcome for every id.
+        Row of user is locked first, so recipes reported as created
+        were inserted by this request and not by a concurrent one.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        with transaction.atomic():
+            User.objects.lock(request.user)
+            missing = set(ids) - set(Recipe.objects.filter(
+                pk__in=ids
+            ).values_list('pk', flat=True))
+            linked = model.objects.filter(user=request.user, recipe__in=ids)
+            if request.method == 'POST':
+                exist = set(linked.values_list('recipe', flat=True))
+                new = [pk for pk in ids if pk not in missing | exist]
+                model.objects.bulk_create(
+                    [model(user=request.user, recipe_id=pk) for pk in new],
+                    ignore_conflicts=True
+                )
+                if model is Cart:
+                    ShoppingListItem.objects.add_recipes(request.user, new)
+                outcomes = batch_outcomes(
+                    ids, missing, set(new), 'created', 'exists'
+                )
+            else:
+                exist = set(linked.values_list('recipe', flat=True))
+                linked.delete()
+                if model is Cart:
+                    ShoppingListItem.objects.remove_recipes(
+                        request.user, exist
+                    )
+                outcomes = batch_outcomes(
+                    ids, missing, exist, 'deleted', 'absent'
+                )
+
+        return Response(outcomes)
+
+    @action(
+        ['post'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        parser_classes=[MultiPartParser],
+        throttle_scope='recipe_write'
+    )
+    def images(self, request):
+        """
+        Multipart upload of image field, streamed to disk.
+        Returns token to send as image of recipe instead of base64.
+        """
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if length > settings.RECIPE_IMAGE_MAX_BYTES + MULTIPART_OVERHEAD:
+            raise ImageTooLarge()
+
+        handler = LimitedUploadHandler(request._request)
+        request._request.upload_handlers = [handler]
+        serializer = ImageUploadSerializer(data=request.data)
+        if handler.too_large:
+            raise ImageTooLarge()
+        serializer.is_valid(raise_exception=True)
+        name = save_image(serializer.validated_data['image'])
+
+        return Response(
+            {
+                'image': image_token(name, request.user),
+                'url': request.build_absolute_uri(
+                    Recipe._meta.get_field('image').storage.url(name)
+                ),
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+    def _tags_counts(self):
+        """All tags with numbers of filtered recipes, one grouped query."""
+        return list(Tag.objects.annotate(recipes_count=Count(
+            'recipes',
+            filter=Q(recipes__in=self.filter_queryset(
+                Recipe.objects.all()
+            ).values('pk'))
+        )).order_by('pk').values(
+            'id', 'name', 'color', 'slug', 'recipes_count'
+        ))
+
+    @action(['get'], detail=False)
+    def facets(self, request):
+        """
+        Tags with numbers of recipes matching other filters of request.
+        Cached by filters until recipes, tags or flags of user change.
+        """
+        filters = tuple(sorted(
+            (name, request.query_params[name])
+            for name in RecipeFilter.base_filters
+            if name in request.query_params
+        ))
+        if USER_FILTERS & {name for name, value in filters}:
+            cache, key = USER_FACETS_CACHE, (request.user.pk, filters)
+        else:
+            cache, key = FACETS_CACHE, filters
+
+        return Response(cache.get_or_set(key, self._tags_counts))
+
+    @action(['get'], detail=True)
+    def similar(self, request, pk):
+        """Recipes with most similar ingredients, most similar first."""
+        pks = list(SimilarRecipe.objects.filter(recipe=pk).order_by(
+            '-score', 'similar'
+        ).values_list('similar', flat=True))
+        if not pks:
+            get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+
+        return Response(recipes_representation(pks, request))
+
     @action(['post', 'delete'], detail=True)
     def shopping_cart(self, request, pk):
         """Adding and removing recipe from shopping cart."""
         return self._lazy_action(request, pk, Cart)
 
-    @action(['get'], detail=False)
+    @action(
+        ['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        throttle_scope='shopping_list'
+    )
     def download_shopping_cart(self, request):
         """Returns .txt file with all ingredients combined."""
         file = 'Your Shopping List'
-        ingredients = list(IngredientThrough.objects.filter(
-            recipe__carts__user=request.user
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
         ).values_list(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(Sum('amount')))
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        ).order_by('ingredient__name')
         for ingredient in ingredients:
             file += '\n{0} ({1}) - {2}'.format(*ingredient)
 
@@ -90,16 +310,75 @@ class RecipeViewSet(ModelViewSet):
 
         return response
 
+    @action(
+        ['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        throttle_scope='shopping_list'
+    )
+    def shopping_list(self, request):
+        """Returns all ingredients from shopping cart combined."""
+        serializer = ShoppingListSerializer(
+            request.user.shopping_list.select_related(
+                'ingredient'
+            ).order_by('ingredient__name'),
+            many=True
+        )
+
+        return Response(serializer.data)
+
+    @action(
+        ['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedPagination
+    )
+    def feed(self, request):
+        """Returns recipes of followed authors, newest first."""
+        page = self.paginate_queryset(FeedEntry.objects.recipes(request.user))
+
+        return self.get_paginated_response(recipes_representation(
+            [entry['recipe_pk'] for entry in page],
+            request
+        ))
+
+    @action(['post', 'delete'], detail=False, url_path='shopping_cart/batch')
+    def shopping_cart_batch(self, request):
+        """Adding and removing list of recipes from shopping cart."""
+        return self._batch_action(request, Cart)
+
     @action(['post', 'delete'], detail=True)
     def favorite(self, request, pk):
         """Add and remove recipe from favorites."""
         return self._lazy_action(request, pk, Favorites)
 
+    @action(['post', 'delete'], detail=False, url_path='favorite/batch')
+    def favorite_batch(self, request):
+        """Add and remove list of recipes from favorites."""
+        return self._batch_action(request, Favorites)
+
     def perform_create(self, serializer):
         """Add user as author to recipe."""
         serializer.save(author=self.request.user)
 
 
+class SyncViewSet(GenericViewSet):
+    """Viewset for changes since cursor."""
+    serializer_class = SyncSerializer
+    permission_classes = [AllowAny]
+    pagination_class = None
+
+    def list(self, request):
+        """Without since returns current cursor only."""
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        since = serializer.validated_data.get('since')
+        if since is None:
+            return Response({'cursor': Change.objects.cursor()})
+
+        return Response(changes_since(request, since))
+
+
 class TagsViewSet(
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
@@ -112,14 +391,45 @@ class TagsViewSet(
     allowed_methods = ['GET']
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return Response(TAGS_CACHE.get_or_set(
+            None,
+            lambda: list(self.get_serializer(
+                self.get_queryset(), many=True
+            ).data)
+        ))
+
 
 class UsersViewSet(DjUserViewSet):
     """Overriden djoset.views.UserViewSet."""
     queryset = User.objects.all()
+    filterset_class = UserFilter
+
+    def get_queryset(self):
+        """
+        Users with is_subscribed of request.user annotated.
+        List and retrieve load only fields asked by request.
+        """
+        queryset = super().get_queryset().order_by('pk')
+        if self.action not in ('list', 'retrieve'):
+            return queryset.with_subscription(self.request.user)
+
+        fields = sparse_fields(self.request, UserSerializer.Meta.fields)
+        if 'is_subscribed' in fields:
+            queryset = queryset.with_subscription(self.request.user)
+
+        return prune_users(queryset, fields)
+
+    def get_instance(self):
+        """Nobody can follow themselves, so no query for is_subscribed."""
+        user = self.request.user
+        user.is_subscribed = False
+
+        return user
 
     def get_permissions(self):
         """New permissions for new actions."""
-        if self.action in ['subscriptions', 'subscribe']:
+        if self.action in ['subscriptions', 'subscribe', 'subscribe_batch']:
             self.permission_classes = [IsAuthenticated]
 
         return super().get_permissions()
@@ -134,13 +444,19 @@ class UsersViewSet(DjUserViewSet):
 
             return SubscriptionsSerializer
 
+        if self.action in BATCH_ACTIONS:
+
+            return BatchIdsSerializer
+
         return super().get_serializer_class()
 
     @action(['get'], detail=False)
     def subscriptions(self, request):
         """Returns all users that request.user follows."""
-        user = request.user
-        queryset = user.follows.all()
+        queryset = prune_users(
+            User.objects.followed_by(request.user),
+            sparse_fields(request, UserSubscriptionsSerializer.Meta.fields)
+        ).order_by('pk')
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -153,15 +469,23 @@ class UsersViewSet(DjUserViewSet):
 
     @action(['post', 'delete'], detail=True)
     def subscribe(self, request, id):
-        """Subscribe and unsubscribe to user."""
+        """
+        Subscribe and unsubscribe to user.
+        Row of user is locked first, as in subscribe_batch.
+        """
         author = get_object_or_404(User, pk=id)
         data = {'follower': request.user.id, 'followed': id}
         if request.method == 'POST':
             serializer = self.get_serializer(data=data)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                User.objects.lock(request.user)
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                FeedEntry.objects.backfill(request.user, [author.pk])
             response_serializer = UserSubscriptionsSerializer(
-                author,
+                User.objects.followed_by(
+                    request.user
+                ).with_recipes_count().get(pk=author.pk),
                 context={'request': request}
             )
 
@@ -170,9 +494,60 @@ class UsersViewSet(DjUserViewSet):
                 status=status.HTTP_201_CREATED
             )
 
-        get_object_or_404(
-            Subscription,
-            **data
-        ).delete()
+        with transaction.atomic():
+            User.objects.lock(request.user)
+            get_object_or_404(
+                Subscription,
+                **data
+            ).delete()
+            FeedEntry.objects.trim(request.user, [author.pk])
 
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(['post', 'delete'], detail=False, url_path='subscribe/batch')
+    def subscribe_batch(self, request):
+        """
+        Subscribe and unsubscribe to list of users.
+        Bulk statements inside one transaction, outcome for every id.
+        Row of user is locked first, as in batch actions of recipes.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        with transaction.atomic():
+            User.objects.lock(request.user)
+            missing = set(ids) - set(User.objects.filter(
+                pk__in=ids
+            ).values_list('pk', flat=True))
+            linked = Subscription.objects.filter(
+                follower=request.user,
+                followed__in=ids
+            )
+            exist = set(linked.values_list('followed', flat=True))
+            if request.method == 'POST':
+                new = [
+                    pk for pk in ids
+                    if pk not in missing | exist and pk != request.user.pk
+                ]
+                Subscription.objects.bulk_create(
+                    [
+                        Subscription(follower=request.user, followed_id=pk)
+                        for pk in new
+                    ],
+                    ignore_conflicts=True
+                )
+                FeedEntry.objects.backfill(request.user, new)
+                outcomes = batch_outcomes(
+                    ids, missing, set(new), 'created', 'exists'
+                )
+                for outcome in outcomes:
+                    if outcome['id'] == request.user.pk:
+                        outcome['status'] = 'self'
+            else:
+                linked.delete()
+                FeedEntry.objects.trim(request.user, exist)
+                outcomes = batch_outcomes(
+                    ids, missing, exist, 'deleted', 'absent'
+                )
+
+        return Response(outcomes)
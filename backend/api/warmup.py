@@ -0,0 +1,59 @@
+"""
+Warm-up of worker before it gets real requests.
+Without it the first requests of every worker pay for lazy imports,
+URL resolver, serializer fields and database connection.
+"""
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.urls import get_resolver
+from PIL import Image
+
+from food.models import Ingredient, Tag
+from .serializers import (IngredientShowSerializer, RecipeInclusionSerializer,
+                          RecipeSerializer, ShoppingListSerializer,
+                          TagsSerializer, UserSerializer,
+                          UserSubscriptionsSerializer)
+
+SERIALIZERS = (
+    IngredientShowSerializer,
+    RecipeInclusionSerializer,
+    RecipeSerializer,
+    ShoppingListSerializer,
+    TagsSerializer,
+    UserSerializer,
+    UserSubscriptionsSerializer,
+)
+
+WARM_UP_URLS = ('/api/tags/', '/api/ingredients/?name=a', '/api/recipes/')
+
+
+def warm_up_code():
+    """Part that needs no database, can be done before fork."""
+    get_resolver().url_patterns
+    get_resolver()._populate()
+    for serializer in SERIALIZERS:
+        serializer().fields
+    Image.init()
+
+
+def warm_up_database():
+    """Part that needs database, done in every worker after fork."""
+    for connection in connections.all():
+        connection.ensure_connection()
+    list(Tag.objects.all())
+    Ingredient.objects.count()
+    client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+    for url in WARM_UP_URLS:
+        client.get(url)
+
+
+def warm_up():
+    """Returns seconds spent."""
+    start = time.perf_counter()
+    warm_up_code()
+    warm_up_database()
+
+    return time.perf_counter() - start
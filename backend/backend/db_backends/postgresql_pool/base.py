@@ -0,0 +1,82 @@
+"""
+PostgreSQL backend with in-process connection pool.
+Connections are taken from psycopg2 ThreadedConnectionPool
+instead of being opened, and returned to it instead of being closed.
+Pool size is set by POOL key of database settings.
+With CONN_HEALTH_CHECKS borrowed connections are pinged first.
+"""
+from threading import Lock
+
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from psycopg2.pool import ThreadedConnectionPool
+
+_pools = {}
+_pools_lock = Lock()
+
+
+def get_pool(alias, settings_dict, conn_params):
+    """One pool per database alias per process."""
+    with _pools_lock:
+        if alias not in _pools:
+            pool_settings = settings_dict.get('POOL', {})
+            _pools[alias] = ThreadedConnectionPool(
+                pool_settings.get('MIN_SIZE', 1),
+                pool_settings.get('MAX_SIZE', 10),
+                **conn_params
+            )
+
+    return _pools[alias]
+
+
+def is_usable(connection):
+    """Pings connection, leaving no transaction open."""
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        connection.rollback()
+    except psycopg2.Error:
+        return False
+
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Default PostgreSQL backend that borrows connections from pool."""
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, self.settings_dict, conn_params)
+        check = self.settings_dict['CONN_HEALTH_CHECKS']
+        connection = pool.getconn()
+        # Idle connections may have been closed by server meanwhile. Every
+        # one dropped lets pool open new one, so this ends within its size.
+        for attempt in range(pool.maxconn):
+            if is_usable(connection) if check else not connection.closed:
+                break
+            pool.putconn(connection, close=True)
+            connection = pool.getconn()
+
+        # Same as in parent method, minus opening connection.
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+
+        return connection
+
+    def _close(self):
+        """Return connection to pool. Pool rolls back unfinished work."""
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                _pools[self.alias].putconn(
+                    self.connection,
+                    close=bool(self.connection.closed)
+                )
@@ -0,0 +1,15 @@
+"""
+SQLite backend that applies PRAGMAS from database settings on connect.
+Used to get WAL journal and less fsync calls under concurrent load.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Default SQLite backend plus PRAGMAS from settings."""
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for pragma, value in self.settings_dict.get('PRAGMAS', {}).items():
+            connection.execute(f'PRAGMA {pragma} = {value}')
+
+        return connection
@@ -0,0 +1,175 @@
+"""
+Invalidation of in-process caches across workers.
+Every topic, label of a model, has a version in storage shared by
+workers, bumped after a write to that model is committed. Versions
+are read at most once per request, caches of a process compare them
+with versions their values were computed with and drop stale values.
+"""
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import lru_cache
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models import F
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+
+TOPICS = (
+    'food.Recipe',
+    'food.Tag',
+    'food.Ingredient',
+    'users.User',
+    'users.Favorites',
+    'users.Cart',
+    'users.Subscription',
+)
+
+# Versions read during current request, None outside of requests.
+request_versions = ContextVar('request_versions', default=None)
+
+
+class CacheVersions:
+    """Versions kept in cache, shared by workers with Redis cache."""
+    prefix = 'topic-version:'
+
+    def __init__(self):
+        self.cache = caches[settings.INVALIDATION_CACHE]
+
+    def get(self, topics):
+        """
+        Returns {topic: version}. Missing versions start from time,
+        so version evicted from cache never comes back with old value.
+        """
+        keys = {self.prefix + topic: topic for topic in topics}
+        versions = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in versions]
+        for key in missing:
+            self.cache.add(key, time.time_ns(), None)
+        if missing:
+            versions.update(self.cache.get_many(missing))
+
+        return {topic: versions.get(key) for key, topic in keys.items()}
+
+    def bump(self, topics):
+        for topic in topics:
+            if not self.cache.add(self.prefix + topic, time.time_ns(), None):
+                self.cache.incr(self.prefix + topic)
+
+
+class DatabaseVersions:
+    """
+    Versions in rows of api.TopicVersion, shared by workers whatever
+    cache is configured. Read from primary, replicas may lag behind.
+    """
+    def manager(self):
+        from api.models import TopicVersion
+
+        return TopicVersion.objects.db_manager(
+            router.db_for_write(TopicVersion)
+        )
+
+    def get(self, topics):
+        versions = dict(self.manager().filter(
+            topic__in=topics
+        ).values_list('topic', 'version'))
+
+        return {topic: versions.get(topic, 0) for topic in topics}
+
+    def bump(self, topics):
+        manager = self.manager()
+        with transaction.atomic(using=manager.db):
+            manager.bulk_create(
+                [manager.model(topic=topic) for topic in topics],
+                ignore_conflicts=True
+            )
+            manager.filter(topic__in=topics).update(version=F('version') + 1)
+
+
+class LocalVersions:
+    """Versions in memory of process. Stand-in for tests."""
+    def __init__(self):
+        self.versions = {}
+
+    def get(self, topics):
+        return {topic: self.versions.get(topic, 0) for topic in topics}
+
+    def bump(self, topics):
+        for topic in topics:
+            self.versions[topic] = self.versions.get(topic, 0) + 1
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.INVALIDATION_BACKEND)()
+
+
+def current_versions():
+    """Versions of all topics, read once per request."""
+    versions = request_versions.get()
+    if versions is None:
+        return get_backend().get(TOPICS)
+
+    if not versions:
+        versions.update(get_backend().get(TOPICS))
+
+    return versions
+
+
+def bump(*models):
+    """Versions of models change once current transaction commits."""
+    topics = [model._meta.label for model in models]
+
+    def commit():
+        get_backend().bump(topics)
+        versions = request_versions.get()
+        if versions:
+            versions.clear()
+
+    transaction.on_commit(commit)
+
+
+class VersionsMiddleware(MiddlewareMixin):
+    """Versions are read lazily, by first cache used in request."""
+    def process_request(self, request):
+        request_versions.set({})
+
+    def process_response(self, request, response):
+        request_versions.set(None)
+
+        return response
+
+
+class LocalCache:
+    """
+    Cache in memory of process for values computed from some models.
+    Value is computed again once any of models got new version.
+    Least recently used values are dropped beyond max_size.
+    """
+    def __init__(self, *models, max_size=256):
+        self.topics = [model._meta.label for model in models]
+        self.max_size = max_size
+        self.values = OrderedDict()
+        self.lock = Lock()
+
+    def get_or_set(self, key, compute):
+        """Returns value for key, calls compute when it is stale."""
+        versions = current_versions()
+        version = tuple(versions[topic] for topic in self.topics)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is not None and entry[0] == version:
+                self.values.move_to_end(key)
+                return entry[1]
+
+        value = compute()
+        with self.lock:
+            self.values[key] = (version, value)
+            self.values.move_to_end(key)
+            while len(self.values) > self.max_size:
+                self.values.popitem(last=False)
+
+        return value
@@ -0,0 +1,68 @@
+"""
+Routing of reads to replicas.
+Writes, transactions and requests of users that wrote recently
+go to primary database, other reads to random replica.
+"""
+import random
+from contextvars import ContextVar
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+use_primary = ContextVar('use_primary', default=False)
+
+
+class PrimaryReplicaRouter:
+    """Database router for primary with read replicas."""
+    def db_for_read(self, model, **hints):
+        if use_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Replicas hold the same data as primary."""
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryStickinessMiddleware(MiddlewareMixin):
+    """
+    Sends unsafe requests to primary.
+    After successful write same client stays on primary for
+    REPLICA_STICKY_SECONDS so it reads its own writes despite replica lag.
+    """
+    def _sticky_key(self, request):
+        """Client is recognized by token, session or address."""
+        client = (
+            request.headers.get('Authorization')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+            or request.META.get('REMOTE_ADDR', '')
+        )
+
+        return 'use-primary:' + sha256(client.encode()).hexdigest()
+
+    def process_request(self, request):
+        use_primary.set(
+            request.method not in SAFE_METHODS
+            or cache.get(self._sticky_key(request)) is not None
+        )
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            cache.set(
+                self._sticky_key(request),
+                True,
+                settings.REPLICA_STICKY_SECONDS
+            )
+
+        return response
@@ -40,8 +40,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.invalidation.VersionsMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -64,10 +66,31 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+ASGI_APPLICATION = 'backend.asgi.application'
+
+# "wsgi" or "asgi". Async views for read-only endpoints are only used
+# when served by ASGI workers.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+ASYNC_READ_VIEWS = SERVER_MODE == 'asgi'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Persistent connections: seconds to keep connection open between requests,
+# 0 closes it after every request. Health checks verify reused connections.
+# ASGI runs sync code in thread pool, where connections are bound to threads
+# and are not closed at end of request, so they are not kept there.
+DB_CONN_MAX_AGE = int(os.getenv(
+    'DB_CONN_MAX_AGE', 0 if SERVER_MODE == 'asgi' else 60
+))
+
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+
+# In-process pool for PostgreSQL. 0 disables pool.
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+
 if os.getenv('DB_ENGINE', None):
     DATABASES = {
         'default': {
@@ -79,17 +102,132 @@ if os.getenv('DB_ENGINE', None):
             'USER': os.getenv('POSTGRES_USER', 'postgres'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'postgres'),
             'HOST': os.getenv('DB_HOST', 'db'),
-            'PORT': os.getenv('DB_PORT', '5432')
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
         }
     }
+    if (DB_POOL_MAX_SIZE
+            and DATABASES['default']['ENGINE'].endswith('postgresql')):
+        DATABASES['default'].update({
+            'ENGINE': 'backend.db_backends.postgresql_pool',
+            # Pooled connection goes back to pool after every request.
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+                'MAX_SIZE': DB_POOL_MAX_SIZE,
+            },
+        })
 else:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
+            'ENGINE': 'backend.db_backends.sqlite3',
             'NAME': 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            'OPTIONS': {
+                # Seconds to wait for lock before "database is locked".
+                'timeout': int(os.getenv('SQLITE_TIMEOUT', 20)),
+            },
+            'PRAGMAS': {
+                'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+                'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+                'temp_store': 'MEMORY',
+                'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -20000)),
+            },
+        }
+    }
+
+# Read replicas. Comma separated hosts for PostgreSQL,
+# or database file names for SQLite (useful for local testing).
+if os.getenv('DB_ENGINE'):
+    DB_REPLICAS, DB_REPLICA_KEY = os.getenv('DB_REPLICA_HOSTS', ''), 'HOST'
+else:
+    DB_REPLICAS, DB_REPLICA_KEY = os.getenv('DB_REPLICA_NAMES', ''), 'NAME'
+
+for number, replica in enumerate(filter(None, DB_REPLICAS.split(','))):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        DB_REPLICA_KEY: replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['backend.routers.PrimaryReplicaRouter']
+    MIDDLEWARE.insert(0, 'backend.routers.PrimaryStickinessMiddleware')
+
+# Seconds client reads from primary after it wrote something.
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
+# Cache shared by all workers is needed for replica stickiness.
+# Without CACHE_LOCATION every process has its own local memory cache.
+if os.getenv('CACHE_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_LOCATION'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         }
     }
 
+# In-process caches are dropped when versions of models they are built
+# from change. Versions are kept in shared cache with CACHE_LOCATION set,
+# in database otherwise, so all workers see them either way.
+# backend.invalidation.LocalVersions keeps them in process, for tests.
+INVALIDATION_BACKEND = os.getenv(
+    'INVALIDATION_BACKEND',
+    'backend.invalidation.CacheVersions' if os.getenv('CACHE_LOCATION')
+    else 'backend.invalidation.DatabaseVersions'
+)
+INVALIDATION_CACHE = 'default'
+
+# Recipes of authors with more followers are not copied into feeds.
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 10000))
+
+# Latest recipes of author put into feed on subscribe.
+FEED_BACKFILL = int(os.getenv('FEED_BACKFILL', 50))
+
+# Limit of recipe image size, for files and for base64.
+RECIPE_IMAGE_MAX_BYTES = int(os.getenv('RECIPE_IMAGE_MAX_BYTES', 5 * 2 ** 20))
+
+# Tokens of uploaded images expire before gc_media may delete their files.
+RECIPE_IMAGE_TOKEN_SECONDS = 1800
+
+# Profiles of requests made with ?_profile=1 by staff are saved here.
+PROFILE_DIR = os.getenv('PROFILE_DIR')
+
+# Length of stored lists of recipes similar by ingredients.
+SIMILAR_RECIPES = int(os.getenv('SIMILAR_RECIPES', 10))
+
+# Recipes compared with saved one by incremental update of lists.
+SIMILAR_CANDIDATES = int(os.getenv('SIMILAR_CANDIDATES', 1000))
+
+# Ingredient weights are counted again after this many seconds or once
+# recipes written since outnumber this share of counted ones.
+SIMILAR_RECOUNT_SECONDS = 24 * 60 * 60
+SIMILAR_RECOUNT_SHARE = 0.1
+
+# Changes returned by one sync request.
+SYNC_PAGE_SIZE = 1000
+
+# Age of changes sync returns, more than journal inserts take to commit.
+SYNC_SETTLE_SECONDS = 5
+
+# Recipe list pages for anonymous users are cached between recipe changes.
+RECIPES_PAGE_CACHE_SECONDS = int(os.getenv('RECIPES_PAGE_CACHE_SECONDS', 60))
+
+# How long other requests wait for the one that builds missing page.
+RECIPES_PAGE_LOCK_SECONDS = 5
+
+RECIPES_PAGE_POLL_SECONDS = 0.05
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -144,10 +282,23 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'api.paginators.PageLimitPagination',
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
+    # Views without throttle_scope are not throttled.
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttles.CounterScopedThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'ingredients': os.getenv('THROTTLE_INGREDIENTS', '120/minute'),
+        'recipe_write': os.getenv('THROTTLE_RECIPE_WRITE', '60/hour'),
+        'shopping_list': os.getenv('THROTTLE_SHOPPING_LIST', '20/minute'),
+    },
 
 }
 
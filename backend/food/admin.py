@@ -1,5 +1,9 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
+from users.models import Favorites
 from .models import Ingredient, IngredientThrough, Recipe, Tag
 
 
@@ -7,12 +11,68 @@ class IngredientsInLine(admin.TabularInline):
     """For correct representation in admin panel."""
     model = IngredientThrough
     extra = 1
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        """IngredientThrough.__str__ needs both related objects."""
+        return super().get_queryset(request).select_related(
+            'ingredient', 'recipe'
+        )
+
+
+class RecipeChangeList(ChangeList):
+    """
+    Only list of recipes shows favorites count, autocomplete and change
+    form use plain queryset. Counted by subquery, no join over favorites.
+    """
+    def get_queryset(self, request):
+        self.root_queryset = self.root_queryset.annotate(
+            favorites_count=Coalesce(Subquery(
+                Favorites.objects.filter(
+                    recipe=OuterRef('pk')
+                ).order_by().values('recipe').annotate(
+                    count=Count('pk')
+                ).values('count')
+            ), 0)
+        )
+
+        return super().get_queryset(request)
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Recipe model for admin panel."""
     inlines = (IngredientsInLine,)
+    list_display = ('name', 'author', 'favorites_count', 'date_created')
+    list_select_related = ('author',)
+    list_filter = ('tags',)
+    # Case-sensitive prefix search, PostgreSQL serves it from indexes
+    # of these columns (varchar_pattern_ops ones Django adds).
+    search_fields = ('name__startswith', 'author__username__startswith')
+    autocomplete_fields = ('author',)
+    list_per_page = 50
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return RecipeChangeList
+
+    @admin.display(description='In favorites', ordering='favorites_count')
+    def favorites_count(self, obj):
+        return obj.favorites_count
+
+
+@admin.register(Ingredient)
+class IngredientAdmin(admin.ModelAdmin):
+    """Ingredient model for admin panel."""
+    list_display = ('name', 'measurement_unit')
+    search_fields = ('name__startswith',)
+    ordering = ('name',)
+    list_per_page = 50
+    show_full_result_count = False
 
 
-admin.site.register([Ingredient, Tag])
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    """Tag model for admin panel."""
+    list_display = ('name', 'slug', 'color')
+    search_fields = ('name', 'slug')
@@ -0,0 +1,82 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from food.models import IngredientThrough, Recipe
+
+BATCH_SIZE = 500
+
+
+def recipe_record(recipe):
+    """Recipe with everything it refers to, by natural keys."""
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'image': recipe.image.name,
+        'date_created': recipe.date_created.isoformat(),
+        'author': {
+            'email': recipe.author.email,
+            'username': recipe.author.username,
+            'first_name': recipe.author.first_name,
+            'last_name': recipe.author.last_name,
+        },
+        'tags': [
+            {'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': ingredient.ingredient.name,
+                'measurement_unit': ingredient.ingredient.measurement_unit,
+                'amount': ingredient.amount,
+            }
+            for ingredient in recipe.ingredients.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    """Command class. See help attribute for further info."""
+    help = '''Write all recipes as NDJSON, one recipe per line, to file
+        or to stdout. Recipes are read in batches, so memory use does not
+        grow with table. Images are exported as references to files
+        in media storage, files themselves are not copied.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='-',
+            help='Output file, stdout by default.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients',
+                IngredientThrough.objects.select_related(
+                    'ingredient'
+                ).order_by('pk')
+            )
+        ).order_by('pk')
+        output = (
+            sys.stdout if options['path'] == '-'
+            else open(options['path'], 'w', encoding='utf8')
+        )
+        count = 0
+        try:
+            for recipe in recipes.iterator(chunk_size=options['batch_size']):
+                output.write(
+                    json.dumps(recipe_record(recipe), ensure_ascii=False)
+                    + '\n'
+                )
+                count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(f'Exported {count} recipes')
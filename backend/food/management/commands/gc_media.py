@@ -0,0 +1,114 @@
+import os
+import shutil
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from food.models import Recipe
+
+BATCH_SIZE = 1000
+MIN_AGE = 3600
+
+
+def media_files(root, min_age):
+    """
+    Yields (name relative to root, size) of files older than min_age.
+    Directories are scanned lazily, memory does not grow with their size.
+    Younger files may belong to recipe not committed yet.
+    """
+    deadline = time.time() - min_age
+    directories = [root] if os.path.isdir(root) else []
+    while directories:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_mtime < deadline:
+                        yield (
+                            os.path.relpath(entry.path, root).replace(
+                                os.sep, '/'
+                            ),
+                            stat.st_size
+                        )
+
+
+class Command(BaseCommand):
+    """Command class. See help attribute for further info."""
+    help = '''Find files in MEDIA_ROOT no recipe refers to and delete
+        them, or move them to quarantine folder. Files are checked against
+        database in batches, so memory use does not depend on number of
+        files. Reports space used by referenced and orphaned files.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report orphaned files.'
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Move orphaned files to this folder instead of deleting. '
+                 'Inside MEDIA_ROOT they are deleted by next run.'
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=MIN_AGE,
+            help='Seconds. Younger files are never touched.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def _remove(self, name, options):
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        if options['quarantine']:
+            target = os.path.join(options['quarantine'], name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+        else:
+            os.remove(path)
+
+    def handle(self, *args, **options):
+        files = media_files(settings.MEDIA_ROOT, options['min_age'])
+        if options['quarantine']:
+            quarantine = os.path.abspath(options['quarantine'])
+            files = (
+                (name, size) for name, size in files
+                if not os.path.join(
+                    os.path.abspath(settings.MEDIA_ROOT), name
+                ).startswith(quarantine + os.sep)
+            )
+        used = used_bytes = orphans = orphan_bytes = 0
+        while True:
+            batch = dict(islice(files, options['batch_size']))
+            if not batch:
+                break
+
+            referenced = set(Recipe.objects.filter(
+                image__in=batch
+            ).values_list('image', flat=True))
+            for name, size in batch.items():
+                if name in referenced:
+                    used += 1
+                    used_bytes += size
+                    continue
+
+                orphans += 1
+                orphan_bytes += size
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Orphan: {name}')
+                if not options['dry_run']:
+                    self._remove(name, options)
+
+        action = (
+            'found' if options['dry_run']
+            else 'quarantined' if options['quarantine']
+            else 'deleted'
+        )
+        self.stdout.write(
+            f'Referenced: {used} files, {used_bytes} bytes\n'
+            f'Orphaned, {action}: {orphans} files, {orphan_bytes} bytes'
+        )
@@ -0,0 +1,189 @@
+import json
+import sys
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from backend.invalidation import bump
+from food.models import (Change, Ingredient, IngredientThrough, Recipe,
+                         SimilarRecipe, Tag)
+from food.signals import refresh_cards
+from users.models import FeedEntry, User
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    """Command class. See help attribute for further info."""
+    help = '''Read NDJSON written by export_recipes from file or stdin.
+        Every batch of recipes is written in one transaction by bulk
+        inserts. Authors are matched by email, tags by slug, ingredients
+        by name and measurement unit, missing ones are created (authors
+        without usable password). Recipes already present with the same
+        content are skipped, so import can be repeated.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='-',
+            help='Input file, stdin by default.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def _authors(self, records):
+        """Returns {email: user pk}, creating missing users."""
+        authors = {record['author']['email']: record['author']
+                   for record in records}
+        known = dict(User.objects.filter(
+            email__in=authors
+        ).values_list('email', 'pk'))
+        new = []
+        for email, author in authors.items():
+            if email not in known:
+                user = User(**author)
+                user.set_unusable_password()
+                new.append(user)
+        for user in User.objects.bulk_create(new):
+            known[user.email] = user.pk
+
+        return known
+
+    def _tags(self, records):
+        """Returns {slug: tag pk} and pks of missing tags it created."""
+        tags = {tag['slug']: tag
+                for record in records for tag in record['tags']}
+        known = dict(Tag.objects.filter(
+            slug__in=tags
+        ).values_list('slug', 'pk'))
+        new = Tag.objects.bulk_create(
+            Tag(**tag) for slug, tag in tags.items() if slug not in known
+        )
+        for tag in new:
+            known[tag.slug] = tag.pk
+
+        return known, [tag.pk for tag in new]
+
+    def _ingredients(self, records):
+        """
+        Adds missing ingredients of records to self.ingredients map,
+        returns their pks.
+        """
+        new = {
+            (ingredient['name'], ingredient['measurement_unit'])
+            for record in records for ingredient in record['ingredients']
+        } - set(self.ingredients)
+        new = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in new
+        )
+        for ingredient in new:
+            self.ingredients[
+                ingredient.name, ingredient.measurement_unit
+            ] = ingredient.pk
+
+        return [ingredient.pk for ingredient in new]
+
+    @transaction.atomic
+    def _import_batch(self, records):
+        """Returns recipes created from records."""
+        authors = self._authors(records)
+        tags, new_tags = self._tags(records)
+        new_ingredients = self._ingredients(records)
+        recipes = {}
+        for record in records:
+            recipe = Recipe(
+                author_id=authors[record['author']['email']],
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image']
+            )
+            recipe.content_hash = recipe.get_content_hash()
+            recipes.setdefault(recipe.content_hash, (recipe, record))
+        exist = set(Recipe.objects.filter(
+            content_hash__in=recipes
+        ).values_list('content_hash', flat=True))
+        recipes = [
+            (recipe, record) for content_hash, (recipe, record)
+            in recipes.items() if content_hash not in exist
+        ]
+        Recipe.objects.bulk_create(recipe for recipe, record in recipes)
+
+        for recipe, record in recipes:
+            if record.get('date_created'):
+                recipe.date_created = parse_datetime(record['date_created'])
+        Recipe.objects.bulk_update(
+            [recipe for recipe, record in recipes], ['date_created']
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tags[tag['slug']])
+            for recipe, record in recipes for tag in record['tags']
+        )
+        IngredientThrough.objects.bulk_create(
+            IngredientThrough(
+                recipe_id=recipe.pk,
+                ingredient_id=self.ingredients[
+                    ingredient['name'], ingredient['measurement_unit']
+                ],
+                amount=ingredient['amount']
+            )
+            for recipe, record in recipes
+            for ingredient in record['ingredients']
+        )
+        created = [recipe for recipe, record in recipes]
+        transaction.on_commit(
+            lambda: self._after_commit(created, new_tags, new_ingredients)
+        )
+
+        return created
+
+    def _after_commit(self, recipes, tags, ingredients):
+        """
+        Bulk inserts send no signals, so cards, feeds and journal
+        of created tags and ingredients done here.
+        """
+        Change.objects.record(Change.Kind.TAG, [(None, pk) for pk in tags])
+        Change.objects.record(
+            Change.Kind.INGREDIENT, [(None, pk) for pk in ingredients]
+        )
+        refresh_cards([recipe.pk for recipe in recipes])
+        SimilarRecipe.objects.refresh([recipe.pk for recipe in recipes])
+        bump(User, Tag, Ingredient, Recipe)
+        for recipe in recipes:
+            FeedEntry.objects.fan_out(recipe)
+
+    def handle(self, *args, **options):
+        self.ingredients = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit'
+            ).iterator()
+        }
+        source = (
+            sys.stdin if options['path'] == '-'
+            else open(options['path'], encoding='utf8')
+        )
+        lines = (line for line in source if line.strip())
+        imported = read = 0
+        try:
+            while True:
+                try:
+                    records = [
+                        json.loads(line)
+                        for line in islice(lines, options['batch_size'])
+                    ]
+                except json.JSONDecodeError as error:
+                    raise CommandError(f'Bad line after {read}: {error}')
+                if not records:
+                    break
+                read += len(records)
+                imported += len(self._import_batch(records))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        self.stdout.write(
+            f'Imported {imported} of {read} recipes, rest already existed'
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from food.models import SimilarRecipe
+
+
+class Command(BaseCommand):
+    """Command class. See help attribute for further info."""
+    help = '''Compute lists of similar recipes of all recipes again.
+        Counts ingredient weights again. Writes update lists incrementally
+        against a bounded number of candidates, run it now and then so all
+        lists are complete and use current weights.'''
+
+    def handle(self, *args, **options):
+        count = SimilarRecipe.objects.rebuild()
+        self.stdout.write(f'Similar recipes listed for {count} recipes')
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.7 on 2026-10-19 19:23
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0003_alter_recipe_cooking_time'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ingredient',
+            options={'verbose_name': 'Ingredient', 'verbose_name_plural': 'Ingredients'},
+        ),
+        migrations.AlterModelOptions(
+            name='ingredientthrough',
+            options={'verbose_name': 'IngredientInRecipe', 'verbose_name_plural': 'IngredientsInRecipe'},
+        ),
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'verbose_name': 'Recipe', 'verbose_name_plural': 'Recipes'},
+        ),
+        migrations.AlterModelOptions(
+            name='tag',
+            options={'verbose_name': 'Tag', 'verbose_name_plural': 'Tags'},
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.7 on 2026-10-19 19:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0004_alter_ingredient_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCard',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='food.recipe')),
+                ('document', models.JSONField(verbose_name='Recipe representation')),
+            ],
+            options={
+                'verbose_name': 'Recipe card',
+                'verbose_name_plural': 'Recipe cards',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-19 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0005_recipecard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='recipe name'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.7 on 2026-10-19 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0006_recipe_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='content_hash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=64, verbose_name='Hash of author, name, text and cooking time'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,43 @@
+from hashlib import sha256
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def content_hash(author_id, name, text, cooking_time):
+    """Frozen copy of food.models.content_hash as it was written."""
+    content = '\x1f'.join(
+        ' '.join(str(value).split()).casefold()
+        for value in (author_id, name, text, cooking_time)
+    )
+
+    return sha256(content.encode()).hexdigest()
+
+
+def fill_content_hash(apps, schema_editor):
+    """Hash content of recipes that existed before."""
+    Recipe = apps.get_model('food', 'Recipe')
+    batch = []
+    for recipe in Recipe.objects.only(
+        'author', 'name', 'text', 'cooking_time'
+    ).iterator(chunk_size=BATCH_SIZE):
+        recipe.content_hash = content_hash(
+            recipe.author_id, recipe.name, recipe.text, recipe.cooking_time
+        )
+        batch.append(recipe)
+        if len(batch) == BATCH_SIZE:
+            Recipe.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0007_recipe_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+import heapq
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+
+# Frozen copy of food.similarity as it was when this migration was written.
+COMMON_SHARE = 0.1
+COMMON_MIN = 100
+
+
+def ingredient_weights(frequencies, total):
+    weights = {
+        ingredient: math.log(1 + total / count)
+        for ingredient, count in frequencies.items()
+    }
+    searchable = {
+        ingredient for ingredient, count in frequencies.items()
+        if count <= max(COMMON_SHARE * total, COMMON_MIN)
+    }
+
+    return weights, searchable
+
+
+def similarity(first, second, weights):
+    shared = sum(weights.get(ingredient, 0) for ingredient in first & second)
+    if not shared:
+        return 0.0
+
+    return shared / sum(
+        weights.get(ingredient, 0) for ingredient in first | second
+    )
+
+
+def nearest(vectors, pks, weights, searchable, k):
+    postings = defaultdict(list)
+    for recipe, ingredients in vectors.items():
+        for ingredient in ingredients & searchable:
+            postings[ingredient].append(recipe)
+    lists = {}
+    for pk in pks:
+        vector = vectors.get(pk, set())
+        others = {
+            other for ingredient in vector & searchable
+            for other in postings[ingredient]
+        }
+        others.discard(pk)
+        lists[pk] = heapq.nlargest(k, (
+            (score, other) for score, other in (
+                (similarity(vector, vectors[other], weights), other)
+                for other in others
+            ) if score > 0
+        ))
+
+    return lists
+
+
+def fill_similar_recipes(apps, schema_editor):
+    """Lists of similar recipes for recipes that existed before."""
+    Recipe = apps.get_model('food', 'Recipe')
+    IngredientThrough = apps.get_model('food', 'IngredientThrough')
+    SimilarRecipe = apps.get_model('food', 'SimilarRecipe')
+    weights, searchable = ingredient_weights(
+        dict(IngredientThrough.objects.order_by().values(
+            'ingredient'
+        ).annotate(
+            count=Count('recipe', distinct=True)
+        ).values_list('ingredient', 'count')),
+        Recipe.objects.count()
+    )
+    vectors = defaultdict(set)
+    for recipe, ingredient in IngredientThrough.objects.values_list(
+        'recipe', 'ingredient'
+    ).iterator(chunk_size=BATCH_SIZE):
+        vectors[recipe].add(ingredient)
+    lists = nearest(
+        vectors, vectors, weights, searchable, settings.SIMILAR_RECIPES
+    )
+    SimilarRecipe.objects.bulk_create(
+        (
+            SimilarRecipe(recipe_id=pk, similar_id=other, score=score)
+            for pk, items in lists.items() for score, other in items
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0009_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_similar_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.1.7 on 2026-10-19 20:41
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0012_ingredient_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='change',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Time of change'),
+            preserve_default=False,
+        ),
+    ]
@@ -1,12 +1,22 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
 
 from users.models import User
+from .similarity import ingredient_weights, nearest, similarity
 
 
 class Ingredient(models.Model):
     """Model for ingredients."""
-    name = models.CharField('Component name', max_length=100)
+    name = models.CharField('Component name', max_length=100, db_index=True)
     measurement_unit = models.CharField('Measurement unit', max_length=10)
 
     class Meta:
@@ -63,6 +73,36 @@ class Tag(models.Model):
         return self.name
 
 
+def content_hash(author_id, name, text, cooking_time):
+    """
+    Hash of recipe content used to find duplicates.
+    Case and whitespace differences do not make recipe new.
+    """
+    content = '\x1f'.join(
+        ' '.join(str(value).split()).casefold()
+        for value in (author_id, name, text, cooking_time)
+    )
+
+    return sha256(content.encode()).hexdigest()
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Recipes deleted in bulk are announced in bulk."""
+    def delete(self):
+        """Sends recipes_deleting once for all recipes."""
+        from .signals import recipes_deleting
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            recipes_deleting.send(
+                Recipe, pks=list(self.values_list('pk', flat=True))
+            )
+
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Recipe(models.Model):
     """Model for recipes."""
     author = models.ForeignKey(
@@ -70,7 +110,7 @@ class Recipe(models.Model):
         models.CASCADE,
         related_name='recipes'
     )
-    name = models.CharField('recipe name', max_length=100)
+    name = models.CharField('recipe name', max_length=100, db_index=True)
     image = models.ImageField()
     text = models.TextField()
     tags = models.ManyToManyField(
@@ -85,6 +125,14 @@ class Recipe(models.Model):
         'Time and date of creation',
         auto_now_add=True
     )
+    content_hash = models.CharField(
+        'Hash of author, name, text and cooking time',
+        max_length=64,
+        db_index=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Recipe'
@@ -92,3 +140,408 @@ class Recipe(models.Model):
 
     def __str__(self) -> str:
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remembers loaded image to notice when it is replaced."""
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_image = dict(zip(field_names, values)).get('image')
+
+        return instance
+
+    def get_content_hash(self):
+        return content_hash(
+            self.author_id, self.name, self.text, self.cooking_time
+        )
+
+    def save(self, *args, **kwargs):
+        """Content hash is kept in sync with content."""
+        self.content_hash = self.get_content_hash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """
+        Recipe has no pre_delete and post_delete receivers, so cascades
+        from authors delete it without loading. recipes_deleting instead.
+        """
+        from .signals import recipes_deleting
+
+        with transaction.atomic(savepoint=False):
+            recipes_deleting.send(Recipe, pks=[self.pk])
+
+            return super().delete(*args, **kwargs)
+
+
+class RecipeCardManager(models.Manager):
+    """Builds and stores recipe documents."""
+    def build(self, pks):
+        """
+        Returns {recipe pk: document} built from five tables
+        with fixed number of queries. Image holds file name, not url.
+        """
+        recipes = list(Recipe.objects.filter(pk__in=pks).values(
+            'id', 'author', 'name', 'image', 'text', 'cooking_time'
+        ))
+        tags = defaultdict(list)
+        for recipe, *tag in Recipe.tags.through.objects.filter(
+            recipe__in=pks
+        ).order_by('pk').values_list(
+            'recipe', 'tag__id', 'tag__name', 'tag__color', 'tag__slug'
+        ):
+            tags[recipe].append(
+                dict(zip(('id', 'name', 'color', 'slug'), tag))
+            )
+        ingredients = defaultdict(list)
+        for recipe, *ingredient in IngredientThrough.objects.filter(
+            recipe__in=pks
+        ).order_by('pk').values_list(
+            'recipe', 'id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ):
+            ingredients[recipe].append(dict(zip(
+                ('id', 'name', 'measurement_unit', 'amount'), ingredient
+            )))
+        authors = {
+            author['id']: author
+            for author in User.objects.filter(
+                pk__in={recipe['author'] for recipe in recipes}
+            ).values('email', 'id', 'username', 'first_name', 'last_name')
+        }
+
+        return {
+            recipe['id']: {
+                'id': recipe['id'],
+                'tags': tags[recipe['id']],
+                'author': authors[recipe['author']],
+                'ingredients': ingredients[recipe['id']],
+                'name': recipe['name'],
+                'image': recipe['image'],
+                'text': recipe['text'],
+                'cooking_time': recipe['cooking_time'],
+            }
+            for recipe in recipes
+        }
+
+    def refresh(self, pks):
+        """Rebuild and store documents of recipes."""
+        documents = self.build(pks)
+        self.bulk_create(
+            [
+                self.model(recipe_id=pk, document=document)
+                for pk, document in documents.items()
+            ],
+            update_conflicts=True,
+            update_fields=['document'],
+            unique_fields=['recipe']
+        )
+
+        return documents
+
+    def documents(self, pks):
+        """
+        Returns {recipe pk: document} with one query.
+        Documents that are not stored yet are built and stored.
+        """
+        documents = dict(
+            self.filter(recipe__in=pks).values_list('recipe', 'document')
+        )
+        missing = set(pks) - set(documents)
+        if missing:
+            documents.update(self.refresh(missing))
+
+        return documents
+
+
+class RecipeCard(models.Model):
+    """
+    Denormalized recipe with tags, ingredients and author.
+    Regenerated whenever any of them changes.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        models.CASCADE,
+        primary_key=True,
+        related_name='card'
+    )
+    document = models.JSONField('Recipe representation')
+
+    objects = RecipeCardManager()
+
+    class Meta:
+        verbose_name = 'Recipe card'
+        verbose_name_plural = 'Recipe cards'
+
+    def __str__(self) -> str:
+        return f'Card of {self.recipe_id}'
+
+
+# Cache keys of ingredient frequencies of similar recipes
+# and of number of recipes written since they were counted.
+FREQUENCIES_KEY = 'similar-recipes-frequencies'
+WRITES_KEY = 'similar-recipes-writes'
+
+# Recipes read by one IN query of refresh.
+SIMILAR_CHUNK = 1000
+
+
+def chunked(pks, size=SIMILAR_CHUNK):
+    pks = list(pks)
+    for start in range(0, len(pks), size):
+        yield pks[start:start + size]
+
+
+class SimilarRecipeManager(models.Manager):
+    """Keeps lists of recipes most similar by ingredients."""
+    def _frequencies(self, writes=0, recount=False):
+        """
+        Returns ({ingredient pk: number of recipes with it}, number of
+        recipes). Counts are kept in cache and counted again after
+        SIMILAR_RECOUNT_SECONDS or once recipes written since counting
+        outnumber SIMILAR_RECOUNT_SHARE of counted ones, so on average
+        counting costs every write about the same, however many recipes.
+        """
+        counted = None if recount else cache.get(FREQUENCIES_KEY)
+        if counted is not None and writes:
+            cache.add(WRITES_KEY, 0, None)
+            if cache.incr(WRITES_KEY, writes) > (
+                settings.SIMILAR_RECOUNT_SHARE * counted[1]
+            ):
+                counted = None
+        if counted is None:
+            counted = (
+                dict(IngredientThrough.objects.order_by().values(
+                    'ingredient'
+                ).annotate(
+                    count=Count('recipe', distinct=True)
+                ).values_list('ingredient', 'count')),
+                Recipe.objects.count()
+            )
+            cache.set(
+                FREQUENCIES_KEY, counted, settings.SIMILAR_RECOUNT_SECONDS
+            )
+            cache.set(WRITES_KEY, 0, None)
+
+        return counted
+
+    def _weights(self, counted, vectors):
+        """
+        Weights and searchable ones of ingredients of vectors.
+        Ingredients new since counting weigh as if in one recipe.
+        """
+        frequencies, total = counted
+
+        return ingredient_weights(
+            {
+                ingredient: frequencies.get(ingredient, 1)
+                for ingredient in set().union(*vectors.values())
+            },
+            max(total, 1)
+        )
+
+    def _vectors(self, through):
+        """Returns {recipe pk: set of ingredient pks}."""
+        vectors = defaultdict(set)
+        for recipe, ingredient in through.values_list(
+            'recipe', 'ingredient'
+        ).iterator():
+            vectors[recipe].add(ingredient)
+
+        return vectors
+
+    def _store(self, lists):
+        """Replaces lists of recipes."""
+        self.filter(recipe__in=lists).delete()
+        self.bulk_create(
+            (
+                self.model(recipe_id=pk, similar_id=other, score=score)
+                for pk, items in lists.items() for score, other in items
+            ),
+            batch_size=1000
+        )
+
+    @transaction.atomic
+    def rebuild(self):
+        """
+        Computes lists of all recipes with ingredient weights counted
+        again. Returns number of recipes.
+        """
+        vectors = self._vectors(IngredientThrough.objects.all())
+        weights, searchable = self._weights(
+            self._frequencies(recount=True), vectors
+        )
+        lists = nearest(
+            vectors, vectors, weights, searchable, settings.SIMILAR_RECIPES
+        )
+        self.all().delete()
+        self._store(lists)
+
+        return len(lists)
+
+    def _candidates(self, pks, searchable):
+        """
+        Recipes to compare with pks, at most SIMILAR_CANDIDATES of ones
+        sharing most searchable ingredients with them and as many of
+        ones listing them.
+        """
+        limit = settings.SIMILAR_CANDIDATES
+        candidates = set(IngredientThrough.objects.filter(
+            ingredient__in=searchable
+        ).exclude(recipe__in=pks).values('recipe').annotate(
+            shared=Count('ingredient')
+        ).order_by('-shared', '-recipe').values_list(
+            'recipe', flat=True
+        )[:limit])
+        candidates.update(self.filter(similar__in=pks).exclude(
+            recipe__in=pks
+        ).order_by('-recipe').values_list('recipe', flat=True)[:limit])
+
+        return candidates
+
+    @transaction.atomic
+    def refresh(self, pks):
+        """
+        Computes lists of recipes again. Candidates compared with them
+        get them merged into their own lists. Lists are complete again
+        after rebuild only, as recipes beyond candidates are not compared.
+        """
+        pks = set(pks)
+        k = settings.SIMILAR_RECIPES
+        counted = self._frequencies(writes=len(pks))
+        vectors = self._vectors(
+            IngredientThrough.objects.filter(recipe__in=pks)
+        )
+        candidates = self._candidates(
+            pks, self._weights(counted, vectors)[1]
+        )
+        current = defaultdict(list)
+        for chunk in chunked(candidates):
+            vectors.update(self._vectors(
+                IngredientThrough.objects.filter(recipe__in=chunk)
+            ))
+            for recipe, other, score in self.filter(
+                recipe__in=chunk
+            ).values_list('recipe', 'similar', 'score'):
+                current[recipe].append((score, other))
+        weights, searchable = self._weights(counted, vectors)
+        lists = nearest(vectors, pks, weights, searchable, k)
+
+        for recipe in candidates:
+            kept = [item for item in current[recipe] if item[1] not in pks]
+            fresh = [
+                (similarity(vectors[recipe], vectors[pk], weights), pk)
+                for pk in pks if pk in vectors
+            ]
+            merged = heapq.nlargest(
+                k, (item for item in kept + fresh if item[0] > 0)
+            )
+            if merged != sorted(current[recipe], reverse=True):
+                lists[recipe] = merged
+        self._store(lists)
+
+
+class SimilarRecipe(models.Model):
+    """Recipe among ones most similar to another by ingredients."""
+    recipe = models.ForeignKey(
+        Recipe,
+        models.CASCADE,
+        related_name='similar'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField('Similarity')
+
+    objects = SimilarRecipeManager()
+
+    class Meta:
+        verbose_name = 'Similar recipe'
+        verbose_name_plural = 'Similar recipes'
+        constraints = [models.UniqueConstraint(
+            fields=('recipe', 'similar'),
+            name='SimilarRecipe_unique'
+        )]
+
+    def __str__(self) -> str:
+        return f'{self.similar_id} is similar to {self.recipe_id}'
+
+
+class ChangeManager(models.Manager):
+    """Journal of writes, for clients syncing by cursor."""
+    def record(self, kind, pairs, deleted=False):
+        """
+        Journals (user pk or None, object pk) pairs once transaction
+        commits, so ids are given in about the order clients see writes.
+        """
+        changes = [
+            self.model(kind=kind, user_id=user, object_id=pk, deleted=deleted)
+            for user, pk in pairs
+        ]
+        if changes:
+            transaction.on_commit(lambda: self.bulk_create(changes))
+
+    def horizon(self):
+        """
+        Time before which all changes are committed. Ids are taken on
+        insert, not on commit, so a change younger than SYNC_SETTLE_SECONDS
+        may still commit under id lower than ones already visible.
+        Clients get older changes only, so cursor never skips one.
+        """
+        return timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+    def visible_to(self, user):
+        """Changes of recipes, tags, ingredients and links of user."""
+        if not user.is_authenticated:
+            return self.filter(user=None)
+
+        return self.filter(Q(user=None) | Q(user=user))
+
+    def cursor(self):
+        """
+        Id of latest change before horizon, 0 for empty journal.
+        Read backwards from the end of journal, not aggregated over it.
+        """
+        return self.filter(created__lte=self.horizon()).order_by(
+            '-id'
+        ).values_list('id', flat=True).first() or 0
+
+
+class Change(models.Model):
+    """
+    Object created, updated or deleted. Id is the cursor of sync
+    clients. Changes of links belong to their users, rest to all.
+    """
+    class Kind(models.TextChoices):
+        RECIPE = 'recipe'
+        TAG = 'tag'
+        INGREDIENT = 'ingredient'
+        FAVORITE = 'favorite'
+        CART = 'cart'
+        SUBSCRIPTION = 'subscription'
+
+    kind = models.CharField(max_length=12, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    user = models.ForeignKey(
+        User,
+        models.CASCADE,
+        null=True,
+        related_name='+'
+    )
+    deleted = models.BooleanField(default=False)
+    created = models.DateTimeField('Time of change', auto_now_add=True)
+
+    objects = ChangeManager()
+
+    class Meta:
+        verbose_name = 'Change'
+        verbose_name_plural = 'Changes'
+        indexes = [models.Index(fields=('user', 'id'))]
+
+    def __str__(self) -> str:
+        action = 'deleted' if self.deleted else 'changed'
+        return f'{self.kind} {self.object_id} {action}'
@@ -0,0 +1,157 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from users.models import User
+from .models import (Change, Ingredient, Recipe, RecipeCard, SimilarRecipe,
+                     Tag, chunked)
+
+# User fields shown in recipe cards.
+CARD_USER_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+# Recipes whose cards are rebuilt together after author, tag or ingredient
+# changed, so a popular one does not rebuild all of them in one query.
+CARDS_BATCH = 500
+
+# Sent with pks of recipes after their cards were rebuilt on write.
+cards_refreshed = Signal()
+
+# Sent with pks of recipes about to be deleted, inside deleting transaction.
+# Used instead of pre_delete and post_delete, which make Django load every
+# recipe of deleted author and call receivers one recipe at a time.
+recipes_deleting = Signal()
+
+
+def refresh_cards(pks):
+    RecipeCard.objects.refresh(pks)
+    cards_refreshed.send(RecipeCard, pks=pks)
+
+
+def delete_unused_images(names):
+    """Removes files of images no recipe refers to any more."""
+    names = set(filter(None, names))
+    names -= set(Recipe.objects.filter(
+        image__in=names
+    ).values_list('image', flat=True))
+    storage = Recipe._meta.get_field('image').storage
+    for name in names:
+        storage.delete(name)
+
+
+def refresh_cards_in_batches(pks):
+    for batch in chunked(pks, CARDS_BATCH):
+        refresh_cards(batch)
+
+
+def refresh_cards_on_commit(recipes):
+    """Cards are rebuilt once all related tables are written."""
+    pks = list(recipes.values_list('pk', flat=True))
+    if pks:
+        transaction.on_commit(lambda: refresh_cards_in_batches(pks))
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_card(sender, instance, **kwargs):
+    """
+    Serializers and admin save recipe before or after tags and ingredients,
+    all within one transaction.
+    """
+    transaction.on_commit(lambda: refresh_cards([instance.pk]))
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_similar_recipes(sender, instance, **kwargs):
+    """Ingredients are written by the time transaction commits."""
+    transaction.on_commit(
+        lambda: SimilarRecipe.objects.refresh([instance.pk])
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def delete_replaced_image(sender, instance, created, **kwargs):
+    """Old image is removed once new one is committed."""
+    if 'image' in instance.get_deferred_fields():
+        return
+
+    old = getattr(instance, 'loaded_image', None)
+    instance.loaded_image = instance.image.name
+    if old and old != instance.image.name:
+        transaction.on_commit(lambda: delete_unused_images([old]))
+
+
+@receiver(recipes_deleting)
+def delete_images_of_deleted(sender, pks, **kwargs):
+    names = list(Recipe.objects.filter(
+        pk__in=pks
+    ).values_list('image', flat=True))
+    transaction.on_commit(lambda: delete_unused_images(names))
+
+
+@receiver(recipes_deleting)
+def refresh_similar_of_deleted(sender, pks, **kwargs):
+    """Recipes that listed deleted ones get complete lists again."""
+    referrers = list(SimilarRecipe.objects.filter(
+        similar__in=pks
+    ).exclude(recipe__in=pks).values_list('recipe', flat=True).distinct())
+    if referrers:
+        transaction.on_commit(
+            lambda: SimilarRecipe.objects.refresh(referrers)
+        )
+
+
+@receiver(post_save, sender=User)
+def refresh_author_cards(sender, instance, update_fields=None, **kwargs):
+    """New users have no recipes, last_login is not shown in cards."""
+    if kwargs['created'] or (
+        update_fields and not CARD_USER_FIELDS & set(update_fields)
+    ):
+        return
+
+    refresh_cards_on_commit(instance.recipes.all())
+
+
+@receiver(pre_delete, sender=User)
+def delete_author_recipes(sender, instance, **kwargs):
+    """Recipes of deleted user are deleted by cascade."""
+    pks = list(instance.recipes.values_list('pk', flat=True))
+    if pks:
+        recipes_deleting.send(Recipe, pks=pks)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def refresh_tag_cards(sender, instance, **kwargs):
+    refresh_cards_on_commit(instance.recipes.all())
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def refresh_ingredient_cards(sender, instance, **kwargs):
+    refresh_cards_on_commit(
+        Recipe.objects.filter(ingredients__ingredient=instance).distinct()
+    )
+
+
+@receiver(cards_refreshed)
+def record_recipe_changes(sender, pks, **kwargs):
+    """Cards are refreshed after every change shown in recipe."""
+    Change.objects.record(Change.Kind.RECIPE, [(None, pk) for pk in pks])
+
+
+@receiver(recipes_deleting)
+def record_recipe_deletes(sender, pks, **kwargs):
+    Change.objects.record(
+        Change.Kind.RECIPE, [(None, pk) for pk in pks], deleted=True
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def record_catalog_changes(sender, instance, signal, **kwargs):
+    Change.objects.record(
+        Change.Kind.TAG if sender is Tag else Change.Kind.INGREDIENT,
+        [(None, instance.pk)],
+        deleted=signal is post_delete
+    )
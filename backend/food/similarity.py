@@ -0,0 +1,70 @@
+"""
+Similarity of recipes by ingredients.
+Recipe is a sparse vector of its ingredients weighted by inverse
+document frequency, so ingredients of most recipes, like salt,
+weigh little. Similarity is weighted Jaccard index of two vectors.
+"""
+import heapq
+import math
+from collections import defaultdict
+
+# Ingredients of more recipes than this share, but at least COMMON_MIN,
+# do not make recipes candidates for comparison.
+COMMON_SHARE = 0.1
+COMMON_MIN = 100
+
+
+def ingredient_weights(frequencies, total):
+    """
+    Returns ({ingredient: weight}, set of searchable ingredients)
+    from {ingredient: number of recipes with it} and number of recipes.
+    """
+    weights = {
+        ingredient: math.log(1 + total / count)
+        for ingredient, count in frequencies.items()
+    }
+    searchable = {
+        ingredient for ingredient, count in frequencies.items()
+        if count <= max(COMMON_SHARE * total, COMMON_MIN)
+    }
+
+    return weights, searchable
+
+
+def similarity(first, second, weights):
+    """Weighted Jaccard index of two sets of ingredients."""
+    shared = sum(weights.get(ingredient, 0) for ingredient in first & second)
+    if not shared:
+        return 0.0
+
+    return shared / sum(
+        weights.get(ingredient, 0) for ingredient in first | second
+    )
+
+
+def nearest(vectors, pks, weights, searchable, k):
+    """
+    Returns {pk: [(score, other pk), ...]} with k recipes of vectors most
+    similar to every pk, best first. Only recipes sharing searchable
+    ingredients with pk are compared with it.
+    """
+    postings = defaultdict(list)
+    for recipe, ingredients in vectors.items():
+        for ingredient in ingredients & searchable:
+            postings[ingredient].append(recipe)
+    lists = {}
+    for pk in pks:
+        vector = vectors.get(pk, set())
+        others = {
+            other for ingredient in vector & searchable
+            for other in postings[ingredient]
+        }
+        others.discard(pk)
+        lists[pk] = heapq.nlargest(k, (
+            (score, other) for score, other in (
+                (similarity(vector, vectors[other], weights), other)
+                for other in others
+            ) if score > 0
+        ))
+
+    return lists
@@ -0,0 +1,198 @@
+import io
+import json
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from users.models import Favorites, User
+from .models import (Change, Ingredient, IngredientThrough, Recipe,
+                     RecipeCard, SimilarRecipe, Tag)
+
+
+class SimilarRecipesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='password'
+        )
+        self.ingredients = [
+            Ingredient.objects.create(name=f'ingredient {number}',
+                                      measurement_unit='g')
+            for number in range(6)
+        ]
+
+    def create_recipe(self, name, numbers):
+        """Saved as serializers save it, lists refreshed on commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=self.author,
+                name=name,
+                image='recipes/images/test.png',
+                text=name,
+                cooking_time=1
+            )
+            IngredientThrough.objects.bulk_create(
+                IngredientThrough(
+                    recipe=recipe,
+                    ingredient=self.ingredients[number],
+                    amount=1
+                )
+                for number in numbers
+            )
+
+        return recipe
+
+    def similar(self, recipe):
+        return list(SimilarRecipe.objects.filter(
+            recipe=recipe
+        ).order_by('-score', 'similar').values_list('similar', 'score'))
+
+    def test_saved_recipe_list_matches_rebuild(self):
+        for name, numbers in (
+            ('a', (0, 1, 2)), ('b', (0, 1, 3)), ('c', (0, 4))
+        ):
+            self.create_recipe(name, numbers)
+        recipe = self.create_recipe('d', (1, 2))
+        refreshed = self.similar(recipe)
+        SimilarRecipe.objects.rebuild()
+        self.assertEqual(refreshed, self.similar(recipe))
+
+    @override_settings(SIMILAR_CANDIDATES=2)
+    def test_candidates_are_bounded(self):
+        others = [self.create_recipe(f'other {number}', (0, 1))
+                  for number in range(5)]
+        recipe = self.create_recipe('new', (0, 1, 2))
+        candidates = SimilarRecipe.objects._candidates(
+            {recipe.pk}, {ingredient.pk for ingredient in self.ingredients}
+        )
+        self.assertLessEqual(len(candidates), 4)
+        self.assertTrue(candidates <= {other.pk for other in others})
+
+    @override_settings(SIMILAR_RECOUNT_SHARE=0.5)
+    def test_frequencies_are_recounted_after_writes(self):
+        for number in range(4):
+            self.create_recipe(f'recipe {number}', (0,))
+        SimilarRecipe.objects.rebuild()
+        self.assertEqual(cache.get('similar-recipes-frequencies')[1], 4)
+        self.create_recipe('fifth', (0,))
+        self.create_recipe('sixth', (0,))
+        self.assertEqual(cache.get('similar-recipes-frequencies')[1], 4)
+        self.create_recipe('seventh', (0,))
+        self.assertEqual(cache.get('similar-recipes-frequencies')[1], 7)
+
+
+class ImportRecipesTests(TestCase):
+    def test_created_catalog_is_journaled(self):
+        Tag.objects.create(name='Lunch', color='#00FF00', slug='lunch')
+        record = {
+            'name': 'bread',
+            'text': 'bread',
+            'cooking_time': 5,
+            'image': 'recipes/images/test.png',
+            'author': {'email': 'author@example.com', 'username': 'author'},
+            'tags': [
+                {'name': 'Lunch', 'color': '#00FF00', 'slug': 'lunch'},
+                {'name': 'Dinner', 'color': '#0000FF', 'slug': 'dinner'},
+            ],
+            'ingredients': [
+                {'name': 'flour', 'measurement_unit': 'g', 'amount': 500},
+            ],
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as source:
+            source.write(json.dumps(record) + '\n')
+            source.flush()
+            Change.objects.all().delete()
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command(
+                    'import_recipes', source.name, stdout=io.StringIO()
+                )
+        self.assertEqual(
+            sorted(Change.objects.exclude(
+                kind=Change.Kind.RECIPE
+            ).values_list('kind', 'object_id')),
+            sorted([
+                (Change.Kind.TAG, Tag.objects.get(slug='dinner').pk),
+                (Change.Kind.INGREDIENT, Ingredient.objects.get().pk),
+            ])
+        )
+
+
+class CardsTests(TestCase):
+    @mock.patch('food.signals.CARDS_BATCH', 2)
+    def test_renamed_tag_refreshes_cards_in_batches(self):
+        author = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='password'
+        )
+        tag = Tag.objects.create(name='Lunch', color='#00FF00', slug='lunch')
+        for number in range(5):
+            Recipe.objects.create(
+                author=author,
+                name=f'recipe {number}',
+                image='recipes/images/test.png',
+                text='text',
+                cooking_time=1
+            ).tags.add(tag)
+        tag.name = 'Dinner'
+        with mock.patch.object(
+            RecipeCard.objects, 'refresh', wraps=RecipeCard.objects.refresh
+        ) as refresh, self.captureOnCommitCallbacks(execute=True):
+            tag.save()
+        self.assertEqual(
+            [len(call.args[0]) for call in refresh.call_args_list],
+            [2, 2, 1]
+        )
+        self.assertTrue(all(
+            document['tags'][0]['name'] == 'Dinner'
+            for document in RecipeCard.objects.values_list(
+                'document', flat=True
+            )
+        ))
+
+
+class RecipeAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='password'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.admin,
+            name='bread',
+            image='recipes/images/test.png',
+            text='bread',
+            cooking_time=1
+        )
+        Favorites.objects.create(user=self.admin, recipe=self.recipe)
+        self.client.force_login(self.admin)
+
+    def test_changelist_shows_favorites_count(self):
+        response = self.client.get('/admin/food/recipe/?o=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context['cl'].result_list[0].favorites_count, 1
+        )
+
+    def test_autocomplete_does_not_count_favorites(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/autocomplete/', {
+                'app_label': 'users',
+                'model_name': 'favorites',
+                'field_name': 'recipe',
+                'term': 'bre',
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(
+            'users_favorites' in query['sql']
+            and 'food_recipe' in query['sql']
+            for query in queries.captured_queries
+        ))
@@ -0,0 +1,34 @@
+import os
+
+bind = '0:8000'
+
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+# Import Django and project once in master, workers get it after fork.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'backend.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'backend.wsgi:application'
+
+
+def when_ready(server):
+    """Master: warm up what is shared by all workers after fork."""
+    if preload_app:
+        from api.warmup import warm_up_code
+
+        warm_up_code()
+
+
+def post_worker_init(worker):
+    """Worker with app loaded: connections can not be shared, open them."""
+    from api.warmup import warm_up_code, warm_up_database
+
+    if not preload_app:
+        warm_up_code()
+    try:
+        warm_up_database()
+    except Exception as error:
+        worker.log.warning('Warm-up failed: %s', error)
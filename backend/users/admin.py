@@ -1,5 +1,68 @@
 from django.contrib import admin
 
-from .models import User
+from .models import Cart, Favorites, ShoppingListItem, Subscription, User
 
-admin.site.register(User)
+
+@admin.register(User)
+class UserAdmin(admin.ModelAdmin):
+    """User model for admin panel."""
+    list_display = ('username', 'email', 'first_name', 'last_name')
+    # Case-sensitive prefix search, PostgreSQL serves it from indexes
+    # of these columns (varchar_pattern_ops ones Django adds).
+    search_fields = ('username__startswith', 'email__startswith')
+    list_per_page = 50
+    show_full_result_count = False
+
+
+class UserRecipeAdmin(admin.ModelAdmin):
+    """Common base for Favorites and Cart models in admin panel."""
+    list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = (
+        'user__username__startswith',
+        'recipe__name__startswith'
+    )
+    autocomplete_fields = ('user', 'recipe')
+    list_per_page = 50
+    show_full_result_count = False
+
+
+@admin.register(Favorites)
+class FavoritesAdmin(UserRecipeAdmin):
+    """Favorites model for admin panel."""
+
+
+@admin.register(Cart)
+class CartAdmin(UserRecipeAdmin):
+    """Cart model for admin panel. Keeps shopping lists in sync."""
+    def save_model(self, request, obj, form, change):
+        if change:
+            old = Cart.objects.get(pk=obj.pk)
+            ShoppingListItem.objects.remove_recipes(old.user, [old.recipe_id])
+        super().save_model(request, obj, form, change)
+        ShoppingListItem.objects.add_recipes(obj.user, [obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        ShoppingListItem.objects.remove_recipes(obj.user, [obj.recipe_id])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for cart in queryset.select_related('user'):
+            ShoppingListItem.objects.remove_recipes(
+                cart.user, [cart.recipe_id]
+            )
+        super().delete_queryset(request, queryset)
+
+
+@admin.register(Subscription)
+class SubscriptionAdmin(admin.ModelAdmin):
+    """Subscription model for admin panel."""
+    list_display = ('follower', 'followed')
+    list_select_related = ('follower', 'followed')
+    search_fields = (
+        'follower__username__startswith',
+        'followed__username__startswith'
+    )
+    autocomplete_fields = ('follower', 'followed')
+    list_per_page = 50
+    show_full_result_count = False
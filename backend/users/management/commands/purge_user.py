@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from food.models import Recipe
+from users.models import (Cart, Favorites, FeedEntry, ShoppingListItem,
+                          Subscription, User)
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """Command class. See help attribute for further info."""
+    help = '''Delete users with many recipes, subscriptions or feed
+        entries in batches, every batch in its own short transaction,
+        so hot tables are not locked for long. User is deactivated first,
+        then deleted when nothing big is left. Can be run in background
+        and repeated if interrupted.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='+', type=int, help='User ids.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def _delete_in_batches(self, queryset, batch_size):
+        """Returns number of rows of queryset deleted."""
+        deleted = 0
+        while True:
+            pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return deleted
+
+            queryset.model.objects.filter(pk__in=pks).delete()
+            deleted += len(pks)
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(pk__in=options['ids'])
+        missing = set(options['ids']) - set(users.values_list('pk', flat=True))
+        if missing:
+            self.stderr.write(f'No users with ids: {sorted(missing)}')
+        for user in users:
+            user.is_active = False
+            user.save(update_fields=['is_active'])
+            for queryset in (
+                Recipe.objects.filter(author=user),
+                FeedEntry.objects.filter(user=user),
+                Subscription.objects.filter(followed=user),
+                Subscription.objects.filter(follower=user),
+                Favorites.objects.filter(user=user),
+                Cart.objects.filter(user=user),
+                ShoppingListItem.objects.filter(user=user),
+            ):
+                deleted = self._delete_in_batches(
+                    queryset, options['batch_size']
+                )
+                self.stdout.write(
+                    f'{user.username}: {deleted} '
+                    f'{queryset.model._meta.verbose_name_plural} deleted'
+                )
+            user.delete()
+            self.stdout.write(f'{user.username} deleted')
@@ -0,0 +1,45 @@
+# Generated by Django 4.1.7 on 2026-10-19 19:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0004_alter_ingredient_options_and_more'),
+        ('users', '0002_remove_favorites_favorites_unique_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='cart',
+            options={'verbose_name': 'Cart', 'verbose_name_plural': 'Carts'},
+        ),
+        migrations.AlterModelOptions(
+            name='favorites',
+            options={'verbose_name': 'Favorite', 'verbose_name_plural': 'Favorites'},
+        ),
+        migrations.AlterModelOptions(
+            name='subscription',
+            options={'verbose_name': 'Subscription', 'verbose_name_plural': 'Subscriptions'},
+        ),
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='Total amount needed')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_lists', to='food.ingredient')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Shopping list item',
+                'verbose_name_plural': 'Shopping list items',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='ShoppingList_unique'),
+        ),
+    ]
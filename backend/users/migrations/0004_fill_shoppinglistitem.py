@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import Sum
+
+
+def fill_shopping_lists(apps, schema_editor):
+    """Count shopping lists for carts that existed before."""
+    IngredientThrough = apps.get_model('food', 'IngredientThrough')
+    ShoppingListItem = apps.get_model('users', 'ShoppingListItem')
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row['recipe__carts__user'],
+            ingredient_id=row['ingredient'],
+            amount=row['total']
+        )
+        for row in IngredientThrough.objects.filter(
+            recipe__carts__isnull=False
+        ).values('recipe__carts__user', 'ingredient').annotate(
+            total=Sum('amount')
+        ).order_by().iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def fill_feeds(apps, schema_editor):
+    """Put latest recipes of followed authors into feeds."""
+    FeedEntry = apps.get_model('users', 'FeedEntry')
+    Recipe = apps.get_model('food', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    for subscription in Subscription.objects.iterator():
+        FeedEntry.objects.bulk_create(
+            FeedEntry(
+                user_id=subscription.follower_id,
+                recipe_id=recipe['pk'],
+                author_id=subscription.followed_id,
+                date_created=recipe['date_created']
+            )
+            for recipe in Recipe.objects.filter(
+                author=subscription.followed_id
+            ).order_by('-date_created').values(
+                'pk', 'date_created'
+            )[:settings.FEED_BACKFILL]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.1.7 on 2026-10-19 19:34
+
+from django.db import migrations
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_fill_feedentry'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', users.models.UsersManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-19 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.IntegerField(db_index=True, default=0, verbose_name='Number of followers'),
+        ),
+    ]
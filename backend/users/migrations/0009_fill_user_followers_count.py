@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_followers_count(apps, schema_editor):
+    """Count followers of users that existed before."""
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('users', 'Subscription')
+    User.objects.update(followers_count=Coalesce(Subquery(
+        Subscription.objects.filter(
+            followed=OuterRef('pk')
+        ).order_by().values('followed').annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_followers_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fill_followers_count,
+            migrations.RunPython.noop
+        ),
+    ]
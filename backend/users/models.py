@@ -1,5 +1,54 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import models, transaction
+from django.db.models import (Case, Count, Exists, F, OuterRef, Q, Subquery,
+                              Sum, Value, When)
+from django.db.models.functions import Coalesce
+
+# Feed entries inserted by one statement of fan-out.
+FAN_OUT_BATCH = 1000
+
+
+class UserQuerySet(models.QuerySet):
+    """Annotations for user representations, computed in one query."""
+    def with_subscription(self, user):
+        """Annotates is_subscribed: user follows this one."""
+        if not user.is_authenticated:
+            return self.annotate(is_subscribed=Value(False))
+
+        return self.annotate(is_subscribed=Exists(Subscription.objects.filter(
+            follower=user,
+            followed=OuterRef('pk')
+        )))
+
+    def followed_by(self, user):
+        """Users that user follows, is_subscribed is known without query."""
+        return self.filter(
+            followers__follower=user
+        ).annotate(is_subscribed=Value(True))
+
+    def lock(self, user):
+        """
+        Locks row of user till transaction ends. Requests changing links
+        of user take it first, so each one sees links the other made.
+        """
+        return self.select_for_update().get(pk=user.pk)
+
+    def with_recipes_count(self):
+        """Annotates recipes_count with a subquery, no join over recipes."""
+        from food.models import Recipe
+
+        return self.annotate(recipes_count=Coalesce(Subquery(
+            Recipe.objects.filter(author=OuterRef('pk')).order_by().values(
+                'author'
+            ).annotate(count=Count('pk')).values('count')
+        ), 0))
+
+
+class UsersManager(UserManager.from_queryset(UserQuerySet)):
+    """UserManager with annotations of UserQuerySet."""
 
 
 class User(AbstractUser):
@@ -17,10 +66,91 @@ class User(AbstractUser):
         'food.Recipe',
         'Favorites'
     )
+    followers_count = models.IntegerField(
+        'Number of followers',
+        default=0,
+        db_index=True
+    )
+
+    objects = UsersManager()
+
+
+class LinkQuerySet(models.QuerySet):
+    """Links created and deleted in bulk are announced by links_changed."""
+    def bulk_create(self, objs, *args, **kwargs):
+        from .signals import links_changed
+
+        created = super().bulk_create(objs, *args, **kwargs)
+        links_changed.send(
+            self.model,
+            links=[obj.link for obj in created],
+            deleted=False
+        )
+
+        return created
+
+    def delete(self):
+        """
+        Rows are locked and then deleted by pk, so links_changed gets
+        links this call deleted, not ones a concurrent call deleted first.
+        """
+        from .signals import links_changed
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            rows = list(self.select_for_update(of=('self',)).values_list(
+                'pk', *self.model.link_fields
+            ))
+            deleted = self.model._base_manager.using(self.db).filter(
+                pk__in=[pk for pk, *_ in rows]
+            ).delete()
+            if rows:
+                links_changed.send(
+                    self.model,
+                    links=[tuple(link) for _, *link in rows],
+                    deleted=True
+                )
+
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class Link(models.Model):
+    """
+    Base of links between users and recipes. They have no pre_delete
+    and post_delete receivers, so cascades delete them without loading.
+    """
+    # Names of user field and of field of linked object.
+    link_fields = ('user', 'recipe')
+
+    objects = LinkQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @property
+    def link(self):
+        """Returns (user pk, linked object pk)."""
+        return tuple(
+            getattr(self, field + '_id') for field in self.link_fields
+        )
 
+    def delete(self, *args, **kwargs):
+        from .signals import links_changed
 
-class Subscription(models.Model):
+        link = self.link
+        deleted = super().delete(*args, **kwargs)
+        if deleted[0]:
+            links_changed.send(type(self), links=[link], deleted=True)
+
+        return deleted
+
+
+class Subscription(Link):
     """Through model for MToM relation User-User model."""
+    link_fields = ('follower', 'followed')
+
     follower = models.ForeignKey(
         User,
         models.CASCADE,
@@ -44,7 +174,7 @@ class Subscription(models.Model):
         return f'{self.follower.username} follows {self.followed.username}'
 
 
-class Favorites(models.Model):
+class Favorites(Link):
     """
     Through model for MToM relation User-Recipe models.
     Favorites.
@@ -72,7 +202,7 @@ class Favorites(models.Model):
         return f'{self.user.username} favorites {self.recipe.name}'
 
 
-class Cart(models.Model):
+class Cart(Link):
     """
     Through model for MToM relation User-Recipe models.
     Shopping cart.
@@ -98,3 +228,245 @@ class Cart(models.Model):
 
     def __str__(self) -> str:
         return f'{self.recipe.name} in cart of {self.user.username}'
+
+
+class ShoppingListManager(models.Manager):
+    """Keeps shopping lists in sync with carts incrementally."""
+    def recipes_amounts(self, recipe_ids, sign=1):
+        """
+        Returns {ingredient_id: total amount} for recipes.
+        sign=-1 gives amounts to subtract.
+        """
+        from food.models import IngredientThrough
+
+        return {
+            pk: sign * amount
+            for pk, amount in IngredientThrough.objects.filter(
+                recipe__in=recipe_ids
+            ).values_list('ingredient').annotate(Sum('amount')).order_by()
+        }
+
+    def apply(self, user_ids, amounts):
+        """
+        Adds amounts {ingredient_id: amount} to shopping lists of users.
+        Negative amounts subtract, items that ran out are removed.
+        Missing items are inserted empty first, skipping ones concurrent
+        requests inserted, then one UPDATE adds to all of them, so
+        requests sharing items wait for each other instead of failing.
+        """
+        amounts = {pk: amount for pk, amount in amounts.items() if amount}
+        if not amounts or not user_ids:
+            return
+
+        with transaction.atomic():
+            self.bulk_create(
+                [
+                    self.model(user_id=user_id, ingredient_id=pk, amount=0)
+                    for user_id in user_ids
+                    for pk, amount in amounts.items()
+                    if amount > 0
+                ],
+                ignore_conflicts=True
+            )
+            self.filter(user__in=user_ids, ingredient__in=amounts).update(
+                amount=F('amount') + Case(
+                    *[When(ingredient=pk, then=Value(amount))
+                      for pk, amount in amounts.items()],
+                    default=Value(0)
+                )
+            )
+            self.filter(user__in=user_ids, amount__lte=0).delete()
+
+    def forget_recipes(self, recipe_ids):
+        """
+        Deleted recipes leave carts of all users.
+        Two statements however many recipes and carts there are.
+        """
+        from food.models import IngredientThrough
+
+        removed = IngredientThrough.objects.filter(
+            recipe__in=recipe_ids,
+            recipe__carts__user=OuterRef('user'),
+            ingredient=OuterRef('ingredient')
+        ).order_by().values('ingredient').annotate(
+            total=Sum('amount')
+        ).values('total')
+        items = self.filter(user__in=Cart.objects.filter(
+            recipe__in=recipe_ids
+        ).values('user'))
+        items.update(amount=F('amount') - Coalesce(Subquery(removed), 0))
+        items.filter(amount__lte=0).delete()
+
+    def add_recipes(self, user, recipe_ids):
+        """Recipes put in cart of user."""
+        self.apply([user.pk], self.recipes_amounts(recipe_ids))
+
+    def remove_recipes(self, user, recipe_ids):
+        """Recipes taken out of cart of user."""
+        self.apply([user.pk], self.recipes_amounts(recipe_ids, -1))
+
+
+class ShoppingListItem(models.Model):
+    """
+    Ingredients of all recipes in shopping cart combined.
+    Updated whenever cart or ingredients of recipe in cart change.
+    """
+    user = models.ForeignKey(
+        User,
+        models.CASCADE,
+        related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(
+        'food.Ingredient',
+        models.CASCADE,
+        related_name='shopping_lists'
+    )
+    amount = models.IntegerField('Total amount needed')
+
+    objects = ShoppingListManager()
+
+    class Meta:
+        verbose_name = 'Shopping list item'
+        verbose_name_plural = 'Shopping list items'
+        constraints = [models.UniqueConstraint(
+            fields=('user', 'ingredient'),
+            name='ShoppingList_unique'
+        )]
+
+    def __str__(self) -> str:
+        return f'{self.ingredient_id} x {self.amount} for {self.user_id}'
+
+
+class FeedManager(models.Manager):
+    """
+    Fan-out on write for feed of recipes from followed authors.
+    Recipes of authors with more than FEED_FANOUT_LIMIT followers
+    are not copied, they are read directly (fan-in on read).
+    Followers are counted in User.followers_count by subscription signals.
+    """
+    def popular_authors(self):
+        """Ids of authors too popular for fan-out, by indexed count."""
+        return User.objects.filter(
+            followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('pk', flat=True)
+
+    def fan_out(self, recipe):
+        """
+        Put new recipe into feeds of author followers.
+        Followers are streamed and entries inserted FAN_OUT_BATCH at a time,
+        so memory and statement size do not grow with followers.
+        """
+        if self.popular_authors().filter(pk=recipe.author_id).exists():
+            return
+
+        followers = Subscription.objects.filter(
+            followed=recipe.author_id
+        ).values_list('follower', flat=True).iterator(
+            chunk_size=FAN_OUT_BATCH
+        )
+        while batch := list(islice(followers, FAN_OUT_BATCH)):
+            self.bulk_create(
+                [
+                    self.model(
+                        user_id=follower,
+                        recipe=recipe,
+                        author_id=recipe.author_id,
+                        date_created=recipe.date_created
+                    )
+                    for follower in batch
+                ],
+                ignore_conflicts=True
+            )
+
+    def backfill(self, user, author_ids):
+        """Put latest recipes of newly followed authors into feed."""
+        from food.models import Recipe
+
+        entries = []
+        for author_id in User.objects.filter(
+            pk__in=author_ids,
+            followers_count__lte=settings.FEED_FANOUT_LIMIT
+        ).values_list('pk', flat=True):
+            entries.extend(
+                self.model(
+                    user=user,
+                    recipe_id=recipe['pk'],
+                    author_id=author_id,
+                    date_created=recipe['date_created']
+                )
+                for recipe in Recipe.objects.filter(
+                    author=author_id
+                ).order_by('-date_created').values(
+                    'pk', 'date_created'
+                )[:settings.FEED_BACKFILL]
+            )
+        self.bulk_create(entries, ignore_conflicts=True)
+
+    def trim(self, user, author_ids):
+        """Remove recipes of unfollowed authors from feed."""
+        self.filter(user=user, author__in=author_ids).delete()
+
+    def recipes(self, user):
+        """
+        Returns values queryset with recipe_pk and date_created for feed.
+        Feed entries alone if user follows no popular authors,
+        otherwise recipes from entries plus recipes of popular authors.
+        """
+        from food.models import Recipe
+
+        popular = Subscription.objects.filter(
+            follower=user,
+            followed__in=self.popular_authors()
+        ).values_list('followed', flat=True)
+        if not popular.exists():
+            return self.filter(user=user).values(
+                'date_created', recipe_pk=F('recipe')
+            )
+
+        return Recipe.objects.filter(
+            Q(pk__in=self.filter(user=user).values('recipe'))
+            | Q(author__in=popular)
+        ).values('date_created', recipe_pk=F('pk'))
+
+
+class FeedEntry(models.Model):
+    """Recipe of followed author copied into follower feed."""
+    user = models.ForeignKey(
+        User,
+        models.CASCADE,
+        related_name='feed'
+    )
+    recipe = models.ForeignKey(
+        'food.Recipe',
+        models.CASCADE,
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        models.CASCADE,
+        related_name='+'
+    )
+    date_created = models.DateTimeField('Time and date of recipe creation')
+
+    objects = FeedManager()
+
+    class Meta:
+        verbose_name = 'Feed entry'
+        verbose_name_plural = 'Feed entries'
+        constraints = [models.UniqueConstraint(
+            fields=('user', 'recipe'),
+            name='FeedEntry_unique'
+        )]
+        indexes = [
+            models.Index(
+                fields=('user', '-date_created'),
+                name='feedentry_user_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feedentry_user_author_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id} in feed of {self.user_id}'
@@ -0,0 +1,83 @@
+from collections import Counter
+
+from django.db.models import Case, F, Value, When
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from food.models import Change
+from food.signals import recipes_deleting
+from .models import Cart, Favorites, ShoppingListItem, Subscription, User
+
+CHANGE_KINDS = {
+    Favorites: Change.Kind.FAVORITE,
+    Cart: Change.Kind.CART,
+    Subscription: Change.Kind.SUBSCRIPTION,
+}
+
+# Sent with model as sender, links as (user pk, linked object pk) pairs
+# and deleted flag after subscriptions, favorites or carts were created
+# in bulk or deleted. Cascades from users and recipes delete them silently.
+links_changed = Signal()
+
+
+def count_followers(followed_ids, step):
+    """Adds step to followers_count once for every pk in followed_ids."""
+    counts = Counter(followed_ids)
+    if counts:
+        User.objects.filter(pk__in=counts).update(
+            followers_count=F('followers_count') + Case(
+                *[When(pk=pk, then=Value(step * count))
+                  for pk, count in counts.items()],
+                default=Value(0)
+            )
+        )
+
+
+@receiver(recipes_deleting)
+def take_recipes_out_of_shopping_lists(sender, pks, **kwargs):
+    """Deleted recipes leave carts, so their ingredients leave lists."""
+    ShoppingListItem.objects.forget_recipes(pks)
+
+
+@receiver(links_changed)
+def record_links_changes(sender, links, deleted, **kwargs):
+    Change.objects.record(CHANGE_KINDS[sender], links, deleted=deleted)
+
+
+@receiver(post_save, sender=Favorites)
+@receiver(post_save, sender=Cart)
+@receiver(post_save, sender=Subscription)
+def record_link_creation(sender, instance, created, **kwargs):
+    if created:
+        Change.objects.record(CHANGE_KINDS[sender], [instance.link])
+
+
+@receiver(pre_delete, sender=User)
+def record_followers_losing_user(sender, instance, **kwargs):
+    """Subscriptions to deleted user are deleted by cascade."""
+    Change.objects.record(
+        Change.Kind.SUBSCRIPTION,
+        instance.followers.values_list('follower', 'followed'),
+        deleted=True
+    )
+
+
+@receiver(post_save, sender=Subscription)
+def count_new_follower(sender, instance, created, **kwargs):
+    if created:
+        count_followers([instance.followed_id], 1)
+
+
+@receiver(links_changed, sender=Subscription)
+def count_followers_of_links(sender, links, deleted, **kwargs):
+    count_followers(
+        [followed for _, followed in links], -1 if deleted else 1
+    )
+
+
+@receiver(pre_delete, sender=User)
+def uncount_follows_of_user(sender, instance, **kwargs):
+    """Subscriptions of deleted user are deleted by cascade."""
+    count_followers(
+        instance.subscriptions.values_list('followed', flat=True), -1
+    )
@@ -0,0 +1,192 @@
+import threading
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+
+from food.models import Ingredient, IngredientThrough, Recipe
+from .models import FeedEntry, ShoppingListItem, Subscription, User
+
+
+def create_recipe(author, name, ingredients):
+    """Recipe with {ingredient: amount} ingredients."""
+    recipe = Recipe.objects.create(
+        author=author,
+        name=name,
+        image='recipes/images/test.png',
+        text=name,
+        cooking_time=1
+    )
+    IngredientThrough.objects.bulk_create(
+        IngredientThrough(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in ingredients.items()
+    )
+
+    return recipe
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='password'
+    )
+
+
+class FollowersCountTests(TestCase):
+    def setUp(self):
+        self.author = create_user('author')
+        self.readers = [create_user(f'reader{number}') for number in range(3)]
+
+    def followers_count(self):
+        self.author.refresh_from_db()
+
+        return self.author.followers_count
+
+    def test_single_subscriptions_are_counted(self):
+        subscription = Subscription.objects.create(
+            follower=self.readers[0],
+            followed=self.author
+        )
+        self.assertEqual(self.followers_count(), 1)
+        subscription.delete()
+        self.assertEqual(self.followers_count(), 0)
+
+    def test_bulk_subscriptions_are_counted(self):
+        Subscription.objects.bulk_create(
+            Subscription(follower=reader, followed=self.author)
+            for reader in self.readers
+        )
+        self.assertEqual(self.followers_count(), 3)
+        Subscription.objects.filter(follower__in=self.readers[:2]).delete()
+        self.assertEqual(self.followers_count(), 1)
+
+    def test_deleted_follower_is_uncounted(self):
+        Subscription.objects.create(
+            follower=self.readers[0],
+            followed=self.author
+        )
+        self.readers[0].delete()
+        self.assertEqual(self.followers_count(), 0)
+
+    def test_deleting_link_twice_counts_once(self):
+        subscription = Subscription.objects.create(
+            follower=self.readers[0],
+            followed=self.author
+        )
+        Subscription.objects.filter(pk=subscription.pk).delete()
+        Subscription.objects.filter(pk=subscription.pk).delete()
+        subscription.delete()
+        self.assertEqual(self.followers_count(), 0)
+
+
+class FanOutTests(TestCase):
+    @mock.patch('users.models.FAN_OUT_BATCH', 2)
+    def test_every_follower_gets_recipe_in_batches(self):
+        author = create_user('author')
+        readers = [create_user(f'reader{number}') for number in range(5)]
+        Subscription.objects.bulk_create(
+            Subscription(follower=reader, followed=author)
+            for reader in readers
+        )
+        recipe = create_recipe(author, 'bread', {})
+        with self.assertNumQueries(5):
+            FeedEntry.objects.fan_out(recipe)
+        self.assertEqual(
+            sorted(FeedEntry.objects.filter(
+                recipe=recipe
+            ).values_list('user', flat=True)),
+            sorted(reader.pk for reader in readers)
+        )
+
+
+class ShoppingListMixin:
+    def setUp(self):
+        self.user = create_user('cook')
+        self.salt = Ingredient.objects.create(
+            name='salt',
+            measurement_unit='g'
+        )
+        self.flour = Ingredient.objects.create(
+            name='flour',
+            measurement_unit='g'
+        )
+        self.bread = create_recipe(
+            self.user, 'bread', {self.salt: 5, self.flour: 500}
+        )
+        self.soup = create_recipe(self.user, 'soup', {self.salt: 10})
+
+    def shopping_list(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient', 'amount'))
+
+
+class ShoppingListTests(ShoppingListMixin, TestCase):
+    def test_add_recipes_sums_amounts(self):
+        ShoppingListItem.objects.add_recipes(self.user, [self.bread.pk])
+        ShoppingListItem.objects.add_recipes(self.user, [self.soup.pk])
+        self.assertEqual(
+            self.shopping_list(),
+            {self.salt.pk: 15, self.flour.pk: 500}
+        )
+
+    def test_remove_recipes_drops_items_that_ran_out(self):
+        ShoppingListItem.objects.add_recipes(
+            self.user, [self.bread.pk, self.soup.pk]
+        )
+        ShoppingListItem.objects.remove_recipes(self.user, [self.bread.pk])
+        self.assertEqual(self.shopping_list(), {self.salt.pk: 10})
+
+    def test_remove_from_empty_list_adds_nothing(self):
+        ShoppingListItem.objects.remove_recipes(self.user, [self.bread.pk])
+        self.assertEqual(self.shopping_list(), {})
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentShoppingListTests(ShoppingListMixin, TransactionTestCase):
+    def test_concurrent_adds_of_new_item(self):
+        """
+        Second request adds salt while first one inserted salt item
+        and has not committed yet.
+        """
+        first_applied = threading.Event()
+        errors = []
+
+        def add(recipe, applied=None, wait=None):
+            amounts = ShoppingListItem.objects.recipes_amounts([recipe.pk])
+            try:
+                if wait:
+                    wait.wait(5)
+                with transaction.atomic():
+                    ShoppingListItem.objects.apply([self.user.pk], amounts)
+                    if applied:
+                        applied.set()
+                        threading.Event().wait(0.5)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(
+                target=add,
+                args=(self.bread,),
+                kwargs={'applied': first_applied}
+            ),
+            threading.Thread(
+                target=add,
+                args=(self.soup,),
+                kwargs={'wait': first_applied}
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            self.shopping_list(),
+            {self.salt.pk: 15, self.flour.pk: 500}
+        )